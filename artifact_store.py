@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store for downloaded files.
+
+Every output file (daf texts, the Tehillim and Shemonah Kevatzim texts, PDFs) is
+kept once under ``.cache/objects/<ab>/<sha256>`` and its friendly name is a
+hardlink to that object, so identical files written by different scripts (e.g.
+``shmona_kovetz_1.pdf`` and ``shmona_kovetz_aleph.pdf``) take the disk space of
+one. Writing bytes a file already holds is detected by hash and skipped. Where
+hardlinks aren't possible (the output is on another filesystem) the friendly
+file is a plain copy, taking its own space; the store prints a warning the first
+time that happens for each filesystem.
+
+Everything in this repo replaces output files rather than editing them in place;
+anything else should do the same, or the stored object changes along with the file.
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import threading
+from typing import Optional, Tuple
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'objects')
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _temp_name(path: str) -> str:
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+
+
+class ArtifactStore:
+    def __init__(self, root: Optional[str] = DEFAULT_STORE_PATH):
+        """
+        Open (creating if needed) a store directory.
+
+        Args:
+            root: Directory holding the objects; None writes files directly,
+                without deduplication, through the same interface
+        """
+        self.root = root
+        self._copied_devices = set()  # filesystems already warned about, see _copy
+        self._lock = threading.Lock()
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _holds(self, path: str, digest: str, size: int) -> bool:
+        """Whether ``path`` already has exactly these bytes."""
+        try:
+            if os.path.getsize(path) != size:
+                return False
+            obj = self.object_path(digest) if self.root else None
+            if obj and os.path.exists(obj) and os.path.samefile(path, obj):
+                return True
+            return file_hash(path) == digest
+        except OSError:
+            return False
+
+    def _copy(self, source: str, destination: str, path: str):
+        """Copy in place of a hardlink for output ``path``, warning once per filesystem that it isn't deduplicated."""
+        directory = os.path.dirname(os.path.abspath(path))
+        device = os.stat(directory).st_dev
+        with self._lock:
+            warn = device not in self._copied_devices
+            self._copied_devices.add(device)
+        if warn:
+            print(f"Warning: can't hardlink files in {directory} to the artifact store {self.root} "
+                  f"(another filesystem?), so they are copied and not deduplicated. "
+                  f"Use a store on that filesystem (--store or ARTIFACT_STORE) to share their space.")
+        shutil.copyfile(source, destination)
+
+    def _link(self, digest: str, path: str):
+        """Atomically point ``path`` at a stored object (a copy if it can't be hardlinked)."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = _temp_name(path)
+        try:
+            os.link(self.object_path(digest), tmp_path)
+        except OSError:
+            self._copy(self.object_path(digest), tmp_path, path)
+        try:
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def adopt(self, path: str, digest: Optional[str] = None) -> str:
+        """
+        Bring a file that is already on disk into the store without rewriting it.
+
+        The file itself becomes the object if its content is new; otherwise it is
+        replaced by a link to the existing object, freeing its space.
+
+        Returns:
+            The file's SHA-256
+        """
+        digest = digest or file_hash(path)
+        if not self.root:
+            return digest
+        obj = self.object_path(digest)
+        if os.path.exists(obj):
+            if not os.path.samefile(path, obj):
+                self._link(digest, path)
+        else:
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            try:
+                os.link(path, obj)
+            except FileExistsError:
+                self._link(digest, path)  # another writer stored the same bytes just now
+            except OSError:
+                self._copy(path, obj, path)
+        return digest
+
+    def write_bytes(self, path: str, data: bytes) -> bool:
+        """
+        Write ``data`` to ``path`` through the store.
+
+        Returns:
+            False if ``path`` already held these bytes, in which case nothing was written
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if self._holds(path, digest, len(data)):
+            self.adopt(path, digest)
+            return False
+        target = self.object_path(digest) if self.root else path
+        if not (self.root and os.path.exists(target)):
+            os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+            tmp_path = _temp_name(target)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, target)
+        if self.root:
+            self._link(digest, path)
+        return True
+
+    def write_text(self, path: str, text: str) -> bool:
+        """``write_bytes`` for UTF-8 text."""
+        return self.write_bytes(path, text.encode('utf-8'))
+
+    def commit(self, tmp_path: str, path: str) -> bool:
+        """
+        Move a finished temporary file (e.g. a streamed download) into place at ``path``.
+
+        Returns:
+            False if ``path`` already held these bytes; the temporary file is removed either way
+        """
+        digest = file_hash(tmp_path)
+        if self._holds(path, digest, os.path.getsize(tmp_path)):
+            os.remove(tmp_path)
+            self.adopt(path, digest)
+            return False
+        if not self.root:
+            os.replace(tmp_path, path)
+            return True
+        obj = self.object_path(digest)
+        if os.path.exists(obj):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            shutil.move(tmp_path, obj)
+        self._link(digest, path)
+        return True
+
+    def stats(self) -> Tuple[int, int, int]:
+        """(objects, bytes stored, bytes saved by sharing objects between files)."""
+        objects = stored = saved = 0
+        for directory, _, files in os.walk(self.root or ''):
+            for name in files:
+                st = os.stat(os.path.join(directory, name))
+                objects += 1
+                stored += st.st_size
+                saved += st.st_size * max(0, st.st_nlink - 2)
+        return objects, stored, saved
+
+    def gc(self) -> int:
+        """Delete objects no file links to any more. Returns the number removed."""
+        removed = 0
+        for directory, _, files in os.walk(self.root or ''):
+            for name in files:
+                path = os.path.join(directory, name)
+                if os.stat(path).st_nlink == 1:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+
+def default_store() -> ArtifactStore:
+    """
+    Store for the standalone download scripts.
+
+    Uses ``.cache/objects`` unless ``ARTIFACT_STORE`` names another directory
+    (or is set to an empty string to write files directly).
+    """
+    return ArtifactStore(os.environ.get('ARTIFACT_STORE', DEFAULT_STORE_PATH) or None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or maintain the content-addressed artifact store')
+    parser.add_argument('--store', default=os.environ.get('ARTIFACT_STORE') or DEFAULT_STORE_PATH,
+                        help='Store directory (default: .cache/objects)')
+    parser.add_argument('--adopt', nargs='+', metavar='FILE', default=[],
+                        help='Move existing files into the store, deduplicating identical ones')
+    parser.add_argument('--gc', action='store_true', help='Delete objects no file links to any more')
+    args = parser.parse_args()
+
+    store = ArtifactStore(args.store)
+    for path in args.adopt:
+        print(f"{store.adopt(path)[:12]}  {path}")
+    if args.gc:
+        print(f"Removed {store.gc()} unreferenced objects")
+    objects, stored, saved = store.stats()
+    print(f"{objects} objects, {stored / 1024 / 1024:.2f} MB stored, {saved / 1024 / 1024:.2f} MB saved by deduplication")
+
+
+if __name__ == "__main__":
+    main()
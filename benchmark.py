@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Offline throughput benchmark for the downloaders.
+
+Starts mock_sefaria.MockSefariaServer in-process and drives DafYomiDownloader (and,
+optionally, the standalone download_* scripts) against it, reporting wall-clock
+time, requests/sec and p50/p99 latency per run. Nothing touches sefaria.org, so
+every performance change can be measured the same way:
+
+    python benchmark.py --tractates Horayot,Makkot --latency 0.08 --concurrency 8
+
+``--wikitext-mb`` also times wikitext.clean_wikitext on a synthetic page of that
+size in MB/s, next to its _scan fallback and the (leaky) regex chain it replaced.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from daf_yomi_downloader import DafYomiDownloader
+from http_cache import ResponseCache
+from mock_sefaria import MockSefariaServer
+from wikitext import BLANK_LINES, _scan, clean_wikitext
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Standalone scripts that can be benchmarked: name -> file
+SCRIPTS = {
+    "tehillim": "download_tehillim.py",
+    "malbim": "download_malvim_tehillim.py",
+    "shmona": "download_shmona_full.py",
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(name: str, wall: float, latencies: List[float], requests: int, extra: Optional[dict] = None) -> dict:
+    result = {
+        "name": name,
+        "wall_s": round(wall, 3),
+        "requests": requests,
+        "req_per_s": round(requests / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+    result.update(extra or {})
+    return result
+
+
+def bench_downloader(server: MockSefariaServer, tractate: str, args, cache: Optional[ResponseCache], label: str) -> dict:
+    """Download one tractate into a scratch directory and measure it from the client side."""
+    latencies = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        downloader = DafYomiDownloader(
+            output_dir=output_dir,
+            concurrency=args.concurrency,
+            rate=args.rate,
+            burst=args.burst,
+            cache=cache,
+            batch_span=args.batch_span,
+            base_url=server.url,
+        )
+        downloader.session.hooks['response'].append(lambda r, *a, **k: latencies.append(r.elapsed.total_seconds()))
+        server.reset_stats()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext():
+            ok = downloader.download_tractate(tractate)
+        wall = time.perf_counter() - started
+        files = len(os.listdir(output_dir))
+    return summarize(f"{label} {tractate}", wall, latencies, server.stats["requests"], {"ok": ok, "files": files})
+
+
+def bench_script(server: MockSefariaServer, name: str, args) -> dict:
+    """Run a standalone script from a scratch copy (so its output doesn't overwrite the repo's)."""
+    with tempfile.TemporaryDirectory() as workdir:
+        shutil.copy(os.path.join(ROOT, SCRIPTS[name]), workdir)
+        env = dict(os.environ, SEFARIA_BASE_URL=server.url, SEFARIA_CACHE='', ARTIFACT_STORE='', PYTHONPATH=ROOT)
+        server.reset_stats()
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, SCRIPTS[name]], cwd=workdir, env=env,
+                              stdout=None if args.verbose else subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        wall = time.perf_counter() - started
+    return summarize(f"script {name}", wall, list(server.stats["durations"]), server.stats["requests"],
+                     {"ok": proc.returncode == 0})
+
+
+# One paragraph of a Wikisource book page, with the markup clean_wikitext has to remove
+WIKITEXT_PARAGRAPH = (
+    "{{כותרת|{{מודגש|פרק}}|השם רועי}}\n"
+    "'''השם רועי''' - [[השם רועי/פרק א|פרק א]], ראו [[תהלים כג]] "
+    "ו<ref name=\"a\">[[רש\"י]] שם, {{ש}}ד\"ה רועי</ref>"
+    "עוד <span class=\"x\">דברים</span> רבים<ref name=\"a\"/> <!-- הערת עורך -->\n\n\n\n"
+    "ה' רעי לא אחסר, בנאות דשא ירביצני, על מי מנחות ינהלני.\n"
+)
+
+
+def legacy_clean_wikitext(text: str) -> str:
+    """The regex chain clean_wikitext replaced, kept as the benchmark's baseline."""
+    text = re.sub(r'\{\{[^}]+\}\}', '', text)
+    text = re.sub(r'\[\[([^\|]+)\|([^\]]+)\]\]', r'\2', text)
+    text = re.sub(r'\[\[([^\]]+)\]\]', r'\1', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'<ref[^>]*>.*?</ref>', '', text, flags=re.DOTALL)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+def bench_wikitext(size_mb: float, rounds: int = 3) -> List[dict]:
+    """
+    Throughput of the wikitext cleaners on a synthetic page of about ``size_mb`` MB (best of ``rounds``).
+
+    The old regex chain leaks every reference into its output, so its row is a
+    reference point, not a like-for-like comparison; ``output_chars`` shows the
+    difference. The other two rows produce the same text: clean_wikitext, whose
+    C-level passes handle this well-formed page, and _scan, the fallback it uses
+    on malformed markup.
+    """
+    copies = max(1, int(size_mb * 1024 * 1024 / len(WIKITEXT_PARAGRAPH.encode('utf-8'))))
+    text = WIKITEXT_PARAGRAPH * copies
+    size = len(text.encode('utf-8')) / 1024 / 1024
+    results = []
+
+    def scan_only(page: str) -> str:
+        return BLANK_LINES.sub('\n\n', _scan(page)).strip()
+
+    for name, clean in (("old regex chain", legacy_clean_wikitext), ("clean_wikitext", clean_wikitext),
+                        ("_scan fallback", scan_only)):
+        best = float('inf')
+        for _ in range(rounds):
+            started = time.perf_counter()
+            output = clean(text)
+            best = min(best, time.perf_counter() - started)
+        results.append({"name": f"wikitext {name}", "mb": round(size, 2), "wall_s": round(best, 3),
+                        "mb_per_s": round(size / best, 1), "output_chars": len(output)})
+    return results
+
+
+def print_table(results: List[Dict]):
+    print(f"{'run':32} {'wall s':>8} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}  ok")
+    print("-" * 84)
+    for r in results:
+        print(f"{r['name']:32} {r['wall_s']:8.2f} {r['requests']:9d} {r['req_per_s']:8.2f} "
+              f"{r['p50_ms']:8.1f} {r['p99_ms']:8.1f}  {'yes' if r.get('ok') else 'no'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline downloader benchmark against a mock Sefaria server')
+    parser.add_argument('--tractates', default='Horayot,Makkot', help='Comma-separated tractates (default: Horayot,Makkot)')
+    parser.add_argument('--scripts', default='', help=f"Comma-separated standalone scripts to run: {','.join(SCRIPTS)}")
+    parser.add_argument('--concurrency', '-c', type=int, default=8, help='Downloader concurrency (default: 8)')
+    parser.add_argument('--rate', type=float, default=0, help='Downloader rate limit in req/s; 0 = unlimited (default: 0)')
+    parser.add_argument('--burst', type=int, default=4, help='Downloader burst size (default: 4)')
+    parser.add_argument('--batch-span', type=int, default=2, help='Amudim per ranged request (default: 2)')
+    parser.add_argument('--warm', action='store_true', help='Also re-run each tractate against a warm response cache')
+    parser.add_argument('--latency', type=float, default=0.05, help='Mock server latency in seconds (default: 0.05)')
+    parser.add_argument('--jitter', type=float, default=0.02, help='Mock server latency jitter in seconds (default: 0.02)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests failing with 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of requests answered with 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After sent with 429 (default: 1)')
+    parser.add_argument('--max-span', type=int, help='Largest ranged request the mock server accepts')
+    parser.add_argument('--wikitext-mb', type=float, default=0,
+                        help='Also benchmark the wikitext cleaner on a synthetic page of this many MB')
+    parser.add_argument('--json', help='Also write the results as JSON to this file')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Show downloader/script output')
+    args = parser.parse_args()
+
+    wikitext_results = bench_wikitext(args.wikitext_mb) if args.wikitext_mb > 0 else []
+    server = MockSefariaServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                               throttle_rate=args.throttle_rate, retry_after=args.retry_after,
+                               max_span=args.max_span).start()
+    print(f"Mock Sefaria on {server.url} (latency {args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms, "
+          f"errors {args.error_rate:.0%}, 429s {args.throttle_rate:.0%})")
+    results = []
+    try:
+        for tractate in [t.strip() for t in args.tractates.split(',') if t.strip()]:
+            with tempfile.TemporaryDirectory() as cache_dir:
+                cache = ResponseCache(os.path.join(cache_dir, 'bench.sqlite')) if args.warm else None
+                results.append(bench_downloader(server, tractate, args, cache, "downloader"))
+                if cache:
+                    results.append(bench_downloader(server, tractate, args, cache, "downloader warm"))
+                    cache.close()
+        for name in [s.strip() for s in args.scripts.split(',') if s.strip()]:
+            if name not in SCRIPTS:
+                print(f"Unknown script '{name}' (choose from {', '.join(SCRIPTS)})")
+                continue
+            results.append(bench_script(server, name, args))
+    finally:
+        server.stop()
+
+    print()
+    print_table(results)
+    if wikitext_results:
+        print()
+        print(f"{'run':32} {'MB':>8} {'wall s':>8} {'MB/s':>8} {'chars out':>10}")
+        print("-" * 70)
+        for r in wikitext_results:
+            print(f"{r['name']:32} {r['mb']:8.2f} {r['wall_s']:8.3f} {r['mb_per_s']:8.1f} {r['output_chars']:10d}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results + wikitext_results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
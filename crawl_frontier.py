@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Crawl frontier shared by the Wikisource crawlers.
+
+``Frontier`` is a FIFO queue (``collections.deque``) plus a seen-set keyed by a
+normalized form of each URL or title, so ``השם_רועי``, ``השם רועי`` and a
+percent-encoded link to the same page are queued once. Every finished item is
+appended to a JSONL checkpoint together with its result and the links it led
+to; after a crash the checkpoint is replayed and the crawl continues where it
+stopped. ``crawl`` drains a frontier with a small thread pool, so the workers
+share whatever throttle their client applies.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+# visit(items) -> [(item, result, links found on it), ...]
+Visit = Callable[[List[str]], List[Tuple[str, object, List[str]]]]
+
+
+class Frontier:
+    def __init__(self, checkpoint_path: Optional[str] = None, key: Callable[[str], str] = lambda item: item):
+        """
+        Empty frontier, or the state of an interrupted crawl if its checkpoint exists.
+
+        Args:
+            checkpoint_path: JSONL file finished items are appended to (None to keep everything in memory)
+            key: Normalization deciding which items are the same page
+        """
+        self.key = key
+        self.checkpoint_path = checkpoint_path
+        self.pending = deque()
+        self.seen = set()
+        self.results: Dict[str, object] = {}
+        self.resumed = 0
+        self._lock = threading.Lock()
+        self._log = None
+        if checkpoint_path:
+            self._replay()
+            self._log = open(checkpoint_path, 'a', encoding='utf-8')
+
+    def _replay(self):
+        """Load the finished items of an earlier run, dropping a half-written trailing line."""
+        entries, good = [], 0
+        try:
+            with open(self.checkpoint_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        break
+                    good += len(line)
+        except FileNotFoundError:
+            return
+        with open(self.checkpoint_path, 'r+b') as f:
+            f.truncate(good)
+        for entry in entries:
+            self.seen.add(self.key(entry['item']))
+            self.results[entry['item']] = entry['result']
+        for entry in entries:
+            for link in entry['found']:
+                self.add(link)
+        self.resumed = len(entries)
+
+    def add(self, item: str) -> bool:
+        """Queue an item, in its normalized form, unless the same page was seen before. Returns whether it was queued."""
+        key = self.key(item)
+        with self._lock:
+            if key in self.seen:
+                return False
+            self.seen.add(key)
+            self.pending.append(key)
+            return True
+
+    def take(self, count: int = 1) -> List[str]:
+        """Remove up to ``count`` items from the front of the queue."""
+        with self._lock:
+            return [self.pending.popleft() for _ in range(min(count, len(self.pending)))]
+
+    def complete(self, item: str, result, found: List[str]) -> List[str]:
+        """
+        Record a finished item and queue the links found on it.
+
+        Returns:
+            The links that were new
+        """
+        with self._lock:
+            self.results[item] = result
+            if self._log:
+                self._log.write(json.dumps({'item': item, 'result': result, 'found': found}, ensure_ascii=False) + '\n')
+                self._log.flush()
+        return [link for link in found if self.add(link)]
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def close(self, remove: bool = False):
+        """Close the checkpoint; ``remove`` deletes it (once nothing is left to resume)."""
+        if self._log:
+            self._log.close()
+            self._log = None
+        if remove and self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+
+def crawl(frontier: Frontier, visit: Visit, workers: int = 4, batch_size: int = 1) -> List[str]:
+    """
+    Visit everything reachable from the frontier's items, ``workers`` batches at a time.
+
+    Args:
+        frontier: Queue to drain; links returned by ``visit`` are added to it
+        visit: Fetches a batch of items and returns (item, result, links) for each one it finished;
+            items it leaves out, or a batch it raises on, count as failed
+        workers: Batches in flight at once
+        batch_size: Items handed to ``visit`` at once (e.g. 50 titles per API query)
+
+    Returns:
+        Items that weren't finished; they stay out of the checkpoint and are retried by a later run
+    """
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        running = {}
+        while len(frontier) or running:
+            while len(frontier) and len(running) < workers:
+                batch = frontier.take(batch_size)
+                running[executor.submit(visit, batch)] = batch
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = running.pop(future)
+                try:
+                    finished = future.result()
+                except Exception as e:
+                    print(f"  Failed: {', '.join(batch)} ({e})")
+                    failed += batch
+                    continue
+                for item, result, found in finished:
+                    frontier.complete(item, result, found)
+                done_items = {item for item, _, _ in finished}
+                failed += [item for item in batch if item not in done_items]
+    return failed
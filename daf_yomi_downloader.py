@@ -5,82 +5,279 @@ Downloads Hebrew Talmud texts and Steinsaltz commentary from Sefaria.org API
 """
 
 import requests
+import json
 import os
+import re
 import sys
 import time
-from typing import List, Optional, Tuple
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import argparse
 
-# Tractate data from the original app
+from artifact_store import DEFAULT_STORE_PATH, ArtifactStore
+from http_cache import DEFAULT_CACHE_PATH, ResponseCache
+from manifest import Manifest
+from metrics import Metrics, PeriodicDump
+from retry import CircuitOpenError, RetryPolicy
+from sefaria_client import FETCH_ERRORS, SEFARIA_BASE_URL, SefariaClient, flatten_text
+
+# Tractate data from the original app. "first"/"last" are the first and last amud in the
+# Vilna pagination; "daf_count" is the last daf number.
 TRACTATES = [
-    {"english": "Berakhot", "hebrew": "ברכות", "daf_count": 64},
-    {"english": "Shabbat", "hebrew": "שבת", "daf_count": 157},
-    {"english": "Eruvin", "hebrew": "עירובין", "daf_count": 105},
-    {"english": "Pesachim", "hebrew": "פסחים", "daf_count": 121},
-    {"english": "Shekalim", "hebrew": "שקלים", "daf_count": 22},
-    {"english": "Yoma", "hebrew": "יומא", "daf_count": 88},
-    {"english": "Sukkah", "hebrew": "סוכה", "daf_count": 56},
-    {"english": "Beitzah", "hebrew": "ביצה", "daf_count": 40},
-    {"english": "Rosh Hashanah", "hebrew": "ראש השנה", "daf_count": 35},
-    {"english": "Taanit", "hebrew": "תענית", "daf_count": 31},
-    {"english": "Megillah", "hebrew": "מגילה", "daf_count": 32},
-    {"english": "Moed Katan", "hebrew": "מועד קטן", "daf_count": 29},
-    {"english": "Chagigah", "hebrew": "חגיגה", "daf_count": 27},
-    {"english": "Yevamot", "hebrew": "יבמות", "daf_count": 122},
-    {"english": "Ketubot", "hebrew": "כתובות", "daf_count": 112},
-    {"english": "Nedarim", "hebrew": "נדרים", "daf_count": 91},
-    {"english": "Nazir", "hebrew": "נזיר", "daf_count": 66},
-    {"english": "Sotah", "hebrew": "סוטה", "daf_count": 49},
-    {"english": "Gittin", "hebrew": "גיטין", "daf_count": 90},
-    {"english": "Kiddushin", "hebrew": "קידושין", "daf_count": 82},
-    {"english": "Bava Kamma", "hebrew": "בבא קמא", "daf_count": 119},
-    {"english": "Bava Metzia", "hebrew": "בבא מציעא", "daf_count": 119},
-    {"english": "Bava Batra", "hebrew": "בבא בתרא", "daf_count": 175},
-    {"english": "Sanhedrin", "hebrew": "סנהדרין", "daf_count": 113},
-    {"english": "Makkot", "hebrew": "מכות", "daf_count": 24},
-    {"english": "Shevuot", "hebrew": "שבועות", "daf_count": 49},
-    {"english": "Avodah Zarah", "hebrew": "עבודה זרה", "daf_count": 76},
-    {"english": "Horayot", "hebrew": "הוריות", "daf_count": 14},
-    {"english": "Zevachim", "hebrew": "זבחים", "daf_count": 120},
-    {"english": "Menachot", "hebrew": "מנחות", "daf_count": 110},
-    {"english": "Chullin", "hebrew": "חולין", "daf_count": 142},
-    {"english": "Bechorot", "hebrew": "בכורות", "daf_count": 61},
-    {"english": "Arachin", "hebrew": "ערכין", "daf_count": 34},
-    {"english": "Temurah", "hebrew": "תמורה", "daf_count": 34},
-    {"english": "Keritot", "hebrew": "כריתות", "daf_count": 28},
-    {"english": "Meilah", "hebrew": "מעילה", "daf_count": 22},
-    {"english": "Kinnim", "hebrew": "קינים", "daf_count": 4},
-    {"english": "Tamid", "hebrew": "תמיד", "daf_count": 10},
-    {"english": "Middot", "hebrew": "מידות", "daf_count": 4},
-    {"english": "Niddah", "hebrew": "נדה", "daf_count": 73}
+    {"english": "Berakhot", "hebrew": "ברכות", "daf_count": 64, "first": "2a", "last": "64a"},
+    {"english": "Shabbat", "hebrew": "שבת", "daf_count": 157, "first": "2a", "last": "157b"},
+    {"english": "Eruvin", "hebrew": "עירובין", "daf_count": 105, "first": "2a", "last": "105a"},
+    {"english": "Pesachim", "hebrew": "פסחים", "daf_count": 121, "first": "2a", "last": "121b"},
+    {"english": "Shekalim", "hebrew": "שקלים", "daf_count": 22, "first": "2a", "last": "22b"},
+    {"english": "Yoma", "hebrew": "יומא", "daf_count": 88, "first": "2a", "last": "88a"},
+    {"english": "Sukkah", "hebrew": "סוכה", "daf_count": 56, "first": "2a", "last": "56b"},
+    {"english": "Beitzah", "hebrew": "ביצה", "daf_count": 40, "first": "2a", "last": "40b"},
+    {"english": "Rosh Hashanah", "hebrew": "ראש השנה", "daf_count": 35, "first": "2a", "last": "35a"},
+    {"english": "Taanit", "hebrew": "תענית", "daf_count": 31, "first": "2a", "last": "31a"},
+    {"english": "Megillah", "hebrew": "מגילה", "daf_count": 32, "first": "2a", "last": "32a"},
+    {"english": "Moed Katan", "hebrew": "מועד קטן", "daf_count": 29, "first": "2a", "last": "29a"},
+    {"english": "Chagigah", "hebrew": "חגיגה", "daf_count": 27, "first": "2a", "last": "27a"},
+    {"english": "Yevamot", "hebrew": "יבמות", "daf_count": 122, "first": "2a", "last": "122b"},
+    {"english": "Ketubot", "hebrew": "כתובות", "daf_count": 112, "first": "2a", "last": "112b"},
+    {"english": "Nedarim", "hebrew": "נדרים", "daf_count": 91, "first": "2a", "last": "91b"},
+    {"english": "Nazir", "hebrew": "נזיר", "daf_count": 66, "first": "2a", "last": "66b"},
+    {"english": "Sotah", "hebrew": "סוטה", "daf_count": 49, "first": "2a", "last": "49b"},
+    {"english": "Gittin", "hebrew": "גיטין", "daf_count": 90, "first": "2a", "last": "90b"},
+    {"english": "Kiddushin", "hebrew": "קידושין", "daf_count": 82, "first": "2a", "last": "82b"},
+    {"english": "Bava Kamma", "hebrew": "בבא קמא", "daf_count": 119, "first": "2a", "last": "119b"},
+    {"english": "Bava Metzia", "hebrew": "בבא מציעא", "daf_count": 119, "first": "2a", "last": "119a"},
+    {"english": "Bava Batra", "hebrew": "בבא בתרא", "daf_count": 176, "first": "2a", "last": "176b"},
+    {"english": "Sanhedrin", "hebrew": "סנהדרין", "daf_count": 113, "first": "2a", "last": "113b"},
+    {"english": "Makkot", "hebrew": "מכות", "daf_count": 24, "first": "2a", "last": "24b"},
+    {"english": "Shevuot", "hebrew": "שבועות", "daf_count": 49, "first": "2a", "last": "49b"},
+    {"english": "Avodah Zarah", "hebrew": "עבודה זרה", "daf_count": 76, "first": "2a", "last": "76b"},
+    {"english": "Horayot", "hebrew": "הוריות", "daf_count": 14, "first": "2a", "last": "14a"},
+    {"english": "Zevachim", "hebrew": "זבחים", "daf_count": 120, "first": "2a", "last": "120b"},
+    {"english": "Menachot", "hebrew": "מנחות", "daf_count": 110, "first": "2a", "last": "110a"},
+    {"english": "Chullin", "hebrew": "חולין", "daf_count": 142, "first": "2a", "last": "142a"},
+    {"english": "Bechorot", "hebrew": "בכורות", "daf_count": 61, "first": "2a", "last": "61a"},
+    {"english": "Arachin", "hebrew": "ערכין", "daf_count": 34, "first": "2a", "last": "34a"},
+    {"english": "Temurah", "hebrew": "תמורה", "daf_count": 34, "first": "2a", "last": "34a"},
+    {"english": "Keritot", "hebrew": "כריתות", "daf_count": 28, "first": "2a", "last": "28b"},
+    {"english": "Meilah", "hebrew": "מעילה", "daf_count": 22, "first": "2a", "last": "22a"},
+    {"english": "Kinnim", "hebrew": "קינים", "daf_count": 25, "first": "22a", "last": "25a"},
+    {"english": "Tamid", "hebrew": "תמיד", "daf_count": 33, "first": "25b", "last": "33b"},
+    {"english": "Middot", "hebrew": "מידות", "daf_count": 37, "first": "34a", "last": "37b"},
+    {"english": "Niddah", "hebrew": "נדה", "daf_count": 73, "first": "2a", "last": "73a"}
+]
+
+SIDES = ['a', 'b']
+
+# Last amudim refreshed from Sefaria's index API (see --refresh-catalog)
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'tractate_catalog.json')
+
+# Commentaries downloaded alongside the main text: (Sefaria source, file suffix, placeholder when empty)
+COMMENTARIES = [
+    ("Steinsaltz", "steinsaltz", "[No commentary available]"),
+    ("Rashi", "rashi", "[No Rashi available]"),
+    ("Tosafot", "tosafot", "[No Tosafot available]"),
 ]
 
+def parse_amud(amud: str) -> Tuple[int, str]:
+    """Split an amud such as '64a' into (64, 'a')."""
+    return int(amud[:-1]), amud[-1]
+
+
+def section_to_amud(section: int) -> str:
+    """Convert a 1-based Sefaria Talmud section index (1 = 1a, 2 = 1b, 3 = 2a) to an amud."""
+    return f"{(section + 1) // 2}{'a' if section % 2 else 'b'}"
+
+
+def daf_range(tractate_info: dict) -> Tuple[int, int]:
+    """Return the first and last daf numbers of a tractate."""
+    return parse_amud(tractate_info["first"])[0], parse_amud(tractate_info["last"])[0]
+
+
+def daf_sides(tractate_info: dict, daf: int) -> List[str]:
+    """Return the sides of a daf that exist in the tractate, e.g. ['a'] for a daf that ends on the a side."""
+    first, last = parse_amud(tractate_info["first"]), parse_amud(tractate_info["last"])
+    return [side for side in SIDES if first <= (daf, side) <= last]
+
+
+def load_catalog(path: str = CATALOG_PATH) -> List[dict]:
+    """Return TRACTATES with any last amudim cached by --refresh-catalog applied."""
+    tractates = [dict(t) for t in TRACTATES]
+    try:
+        with open(path, encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return tractates
+    for tractate in tractates:
+        last = cached.get(tractate["english"])
+        if last:
+            tractate["last"] = last
+            tractate["daf_count"] = parse_amud(last)[0]
+    return tractates
+
+
+def split_spanning(data: dict, amudim: List[Tuple[int, str]]) -> Optional[Dict[Tuple[int, str], object]]:
+    """
+    Split the ``he`` field of a ranged response into one entry per requested amud.
+
+    Returns None when the response doesn't line up with the requested amudim.
+    """
+    he = data.get('he', [])
+    if not data.get('isSpanning') or not isinstance(he, list):
+        return None
+    spanning_refs = data.get('spanningRefs') or []
+    if len(spanning_refs) == len(he):
+        parts = {}
+        for ref, section in zip(spanning_refs, he):
+            match = re.search(r'(\d+)([ab])', ref.rsplit(' ', 1)[-1])
+            if not match:
+                return None
+            parts[(int(match.group(1)), match.group(2))] = section
+        if not set(parts) <= set(amudim):
+            return None
+        # Amudim missing from the span have no text
+        return {amud: parts.get(amud, []) for amud in amudim}
+    if len(he) == len(amudim):
+        return dict(zip(amudim, he))
+    return None
+
+
+def batch_amudim(amudim: List[Tuple[int, str]], span: int) -> List[List[Tuple[int, str]]]:
+    """Group amudim into runs of at most ``span`` consecutive amudim."""
+    batches = []
+    for amud in amudim:
+        daf, side = amud
+        if batches and len(batches[-1]) < span and batches[-1][-1] == _previous_amud(daf, side):
+            batches[-1].append(amud)
+        else:
+            batches.append([amud])
+    return batches
+
+
+def _previous_amud(daf: int, side: str) -> Tuple[int, str]:
+    return (daf, 'a') if side == 'b' else (daf - 1, 'b')
+
+
+def chunk_dafs(dafs: List[Tuple[str, int]], size: int) -> List[Tuple[str, List[int]]]:
+    """Group (tractate, daf) pairs into runs of at most ``size`` consecutive dafs of one tractate."""
+    chunks = []
+    for tractate, daf in dafs:
+        if chunks and chunks[-1][0] == tractate and len(chunks[-1][1]) < size and chunks[-1][1][-1] == daf - 1:
+            chunks[-1][1].append(daf)
+        else:
+            chunks.append((tractate, [daf]))
+    return chunks
+
+
 class DafYomiDownloader:
-    def __init__(self, output_dir: str = "downloads", delay: float = 1.0):
+    def __init__(
+        self,
+        output_dir: str = "downloads",
+        delay: Optional[float] = None,
+        concurrency: int = 4,
+        rate: float = 2.0,
+        burst: int = 4,
+        cache: Optional[ResponseCache] = None,
+        resume: bool = False,
+        batch_span: int = 2,
+        retry_policy: Optional[RetryPolicy] = None,
+        retry_passes: int = 1,
+        base_url: str = SEFARIA_BASE_URL,
+        metrics: Optional[Metrics] = None,
+        client: Optional[SefariaClient] = None,
+        store: Optional[ArtifactStore] = None,
+    ):
         """
         Initialize the downloader.
         
         Args:
             output_dir: Directory to save downloaded files
-            delay: Delay between API requests (seconds) to be respectful
+            delay: Legacy minimum spacing between requests (seconds); overrides rate as 1/delay
+            concurrency: Number of requests kept in flight at once
+            rate: Requests per second shared by all workers, to be respectful
+            burst: Number of requests that may be sent back-to-back before the rate applies
+            cache: Persistent response cache (None to always hit the network)
+            resume: Skip (daf, source) units the manifest records as already complete
+            batch_span: Maximum number of adjacent amudim fetched in one ranged request
+            retry_policy: Backoff used when a request fails transiently
+            retry_passes: Extra passes over failed units at the end of a download
+            base_url: Sefaria server to talk to
+            metrics: Where request, cache and file-write metrics are recorded
+            client: Sefaria client to use instead of building one from the arguments above
+            store: Content-addressed store the output files are deduplicated through (None to write them directly)
         """
         self.output_dir = output_dir
-        self.delay = delay
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Daf Yomi Downloader (respectful automated access)'
-        })
+        self.concurrency = max(1, concurrency)
+        self.batch_span = max(1, batch_span)
+        if delay is not None:
+            rate, burst = (1.0 / delay if delay > 0 else 0), 1
+        self.client = client or SefariaClient(
+            base_url=base_url,
+            rate=rate,
+            burst=burst,
+            concurrency=self.concurrency,
+            cache=cache,
+            retry_policy=retry_policy,
+            metrics=metrics,
+        )
+        self.cache = self.client.cache
+        self.metrics = self.client.metrics
+        self.session = self.client.session
+        self.rate_limiter = self.client.rate_limiter
+        self.store = store or ArtifactStore(None)
+        self.known_empty_skipped = 0
+        self.retry_passes = retry_passes
         
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
+        self.resume = resume
+        self.manifest = Manifest(output_dir)
+        self.tractates = load_catalog()
     
     def get_tractate_info(self, tractate_name: str) -> Optional[dict]:
         """Get tractate information by English name."""
-        for tractate in TRACTATES:
+        for tractate in self.tractates:
             if tractate["english"].lower() == tractate_name.lower():
                 return tractate
         return None
     
+    def refresh_catalog(self, path: str = CATALOG_PATH) -> int:
+        """
+        Fetch each tractate's last amud from Sefaria's index API and cache it on disk.
+
+        Tractates Sefaria doesn't index as Talmud (e.g. Kinnim, Middot) keep the
+        built-in values.
+        
+        Returns:
+            Number of tractates updated from the index
+        """
+        cached = {}
+        for tractate in self.tractates:
+            name = tractate["english"]
+            try:
+                data = self.client.index(name)
+            except FETCH_ERRORS as e:
+                print(f"  Could not fetch index for {name}: {e}")
+                continue
+            schema = data.get("schema", {})
+            lengths = schema.get("lengths") or []
+            if (schema.get("addressTypes") or ["Talmud"])[0] != "Talmud" or not lengths:
+                continue
+            last = section_to_amud(lengths[0])
+            if last != tractate["last"]:
+                print(f"  {name}: last amud {tractate['last']} -> {last}")
+            cached[name] = last
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(cached, f, ensure_ascii=False, indent=1)
+        self.tractates = load_catalog(path)
+        return len(cached)
+    
+    @staticmethod
+    def _ref(tractate: str, source: str, amud_ref: str) -> str:
+        return f"{tractate}.{amud_ref}" if source == "main" else f"{source} on {tractate}.{amud_ref}"
+
     def fetch_text(self, tractate: str, daf: int, side: str, source: str = "main") -> Tuple[bool, str]:
         """
         Fetch text from Sefaria API.
@@ -94,24 +291,14 @@ class DafYomiDownloader:
         Returns:
             (success, text) tuple
         """
-        if source == "main":
-            url = f"https://www.sefaria.org/api/texts/{tractate}.{daf}{side}?lang=he&commentary=0&context=0"
-        else:
-            url = f"https://www.sefaria.org/api/texts/{source} on {tractate}.{daf}{side}?lang=he&context=0"
+        ref = self._ref(tractate, source, f"{daf}{side}")
         
         try:
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            hebrew_text = data.get('he', [])
-            if isinstance(hebrew_text, list):
-                text = '\n'.join(hebrew_text)
-            else:
-                text = str(hebrew_text) if hebrew_text else ""
-            
-            return True, text
+            data = self.client.texts(ref, source, base_text=source == "main")
+            return True, flatten_text(data.get('he', []))
             
+        except CircuitOpenError as e:
+            return False, f"Deferred: {e}"
         except requests.exceptions.RequestException as e:
             print(f"Error fetching {tractate} {daf}{side}: {e}")
             return False, f"Error fetching: {e}"
@@ -119,6 +306,258 @@ class DafYomiDownloader:
             print(f"Unexpected error for {tractate} {daf}{side}: {e}")
             return False, f"Unexpected error: {e}"
     
+    def fetch_range(self, tractate: str, amudim: List[Tuple[int, str]], source: str = "main") -> Dict[Tuple[int, str], Tuple[bool, str]]:
+        """
+        Fetch several adjacent amudim with a single ranged Sefaria request (e.g. ``Berakhot.2a-3b``).
+
+        Sefaria answers a spanning ref with one nested array per amud, which is split
+        back into per-amud texts. If the response can't be split, each amud is fetched
+        on its own instead.
+        
+        Args:
+            tractate: English name of tractate
+            amudim: Consecutive (daf, side) pairs, in order
+            source: "main" for base text or a commentary name
+            
+        Returns:
+            Mapping of (daf, side) to a (success, text) tuple
+        """
+        if len(amudim) == 1:
+            daf, side = amudim[0]
+            return {amudim[0]: self.fetch_text(tractate, daf, side, source)}
+        
+        first, last = (f"{daf}{side}" for daf, side in (amudim[0], amudim[-1]))
+        ref = self._ref(tractate, source, f"{first}-{last}")
+        
+        try:
+            data = self.client.texts(ref, source, base_text=source == "main")
+        except CircuitOpenError as e:
+            return {amud: (False, f"Deferred: {e}") for amud in amudim}
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching {tractate} {first}-{last}: {e}")
+            return {amud: (False, f"Error fetching: {e}") for amud in amudim}
+        except Exception as e:
+            print(f"Unexpected error for {tractate} {first}-{last}: {e}")
+            return {amud: (False, f"Unexpected error: {e}") for amud in amudim}
+        
+        parts = split_spanning(data, amudim)
+        if parts is None:
+            print(f"  Could not split {ref}, fetching amudim one by one")
+            return {(daf, side): self.fetch_text(tractate, daf, side, source) for daf, side in amudim}
+        self.client.store_sections({self._ref(tractate, source, f"{daf}{side}"): he for (daf, side), he in parts.items()})
+        return {amud: (True, flatten_text(he)) for amud, he in parts.items()}
+    
+    def _sources(self, include_steinsaltz: bool, include_rashi: bool, include_tosafot: bool) -> List[str]:
+        """Return the sources to fetch for each amud, main text first."""
+        enabled = {"Steinsaltz": include_steinsaltz, "Rashi": include_rashi, "Tosafot": include_tosafot}
+        return ["main"] + [source for source, _, _ in COMMENTARIES if enabled[source]]
+
+    def _fetch_unit(self, tractate: str, amudim: List[Tuple[int, str]], source: str) -> Dict[Tuple[int, str], Tuple[bool, str]]:
+        """Fetch one batch of (amud, source) units on a worker thread."""
+        span = f"{amudim[0][0]}{amudim[0][1]}" + (f"-{amudim[-1][0]}{amudim[-1][1]}" if len(amudim) > 1 else "")
+        if source == "main":
+            print(f"  Fetching {tractate} {span}...")
+        else:
+            print(f"  Fetching {tractate} {span} {source}...")
+        with self.metrics.timer('fetch_duration_seconds', source=source):
+            results = self.fetch_range(tractate, amudim, source)
+        if source != "main":
+            for (daf, side), (success, text) in results.items():
+                if success:
+                    self.client.record_empty(self._ref(tractate, source, f"{daf}{side}"), not text.strip())
+        return results
+
+    def _is_known_empty(self, tractate: str, source: str, amud: Tuple[int, str]) -> bool:
+        """True if a commentary amud is recorded in the negative cache as having no text."""
+        return source != "main" and self.client.is_known_empty(self._ref(tractate, source, f"{amud[0]}{amud[1]}"))
+
+    def _output_filename(self, tractate: str, daf: int, source: str) -> str:
+        suffix = next((f"_{suffix}" for name, suffix, _ in COMMENTARIES if name == source), "")
+        return os.path.join(self.output_dir, f"{tractate}_{daf}{suffix}.txt")
+
+    def _pending_sources(self, tractate: str, daf: int, sources: List[str]) -> List[str]:
+        """Drop sources the manifest already records as complete when resuming."""
+        if not self.resume:
+            return sources
+        return [
+            source for source in sources
+            if not self.manifest.is_complete(tractate, daf, source, self._output_filename(tractate, daf, source))
+        ]
+
+    def _submit_chunk(self, executor: ThreadPoolExecutor, tractate: str, dafs: List[int], sources: List[str],
+                      pending: Optional[Dict[Tuple[str, int], List[str]]] = None) -> Dict[int, Dict[Tuple[str, str], Future]]:
+        """
+        Queue the requests for a run of consecutive dafs of one tractate on the executor.
+
+        Amudim that still need downloading are grouped per source into ranged
+        requests of up to ``batch_span`` amudim. Commentary amudim the negative cache
+        knows to be empty are resolved immediately without a request. Every
+        (side, source) unit of a daf maps to the future of the batch that covers it.
+
+        Args:
+            pending: Sources to fetch per (tractate, daf); defaults to whatever the
+                manifest doesn't already record as complete
+        """
+        if pending is None:
+            todo = {daf: self._pending_sources(tractate, daf, sources) for daf in dafs}
+        else:
+            todo = {daf: pending.get((tractate, daf), []) for daf in dafs}
+        futures = {daf: {} for daf in dafs}
+        for daf in dafs:
+            if not todo[daf]:
+                print(f"  Skipping {tractate} {daf} (already complete)")
+        
+        tractate_info = self.get_tractate_info(tractate)
+        for source in sources:
+            amudim = [(daf, side) for daf in dafs if source in todo[daf] for side in daf_sides(tractate_info, daf)]
+            known_empty = [amud for amud in amudim if self._is_known_empty(tractate, source, amud)]
+            if known_empty:
+                future = Future()
+                future.set_result({amud: (True, "") for amud in known_empty})
+                self.known_empty_skipped += len(known_empty)
+                self.metrics.inc('negative_cache_skips_total', len(known_empty), source=source)
+                for daf, side in known_empty:
+                    futures[daf][(side, source)] = future
+            to_fetch = [amud for amud in amudim if amud not in known_empty]
+            for batch in batch_amudim(to_fetch, self.batch_span):
+                future = executor.submit(self._fetch_unit, tractate, batch, source)
+                for daf, side in batch:
+                    futures[daf][(side, source)] = future
+        return futures
+
+    def _save_daf(self, tractate: str, daf: int, sources: List[str], futures: Dict[Tuple[str, str], Future]) -> List[str]:
+        """
+        Wait for the requests of a daf and write its output files.
+
+        A source is only written once both of its sides were fetched successfully;
+        failed sources leave any existing file untouched.
+
+        Returns:
+            Sources that failed to download or save (empty if the daf is complete)
+        """
+        outputs = [("main", "", "[No text available]")] + [c for c in COMMENTARIES if c[0] in sources]
+        sides = daf_sides(self.get_tractate_info(tractate), daf)
+        failed = []
+        
+        for source, _, placeholder in outputs:
+            if (sides[0], source) not in futures:
+                continue  # already complete on disk
+            combined = ""
+            errors = []
+            for side in sides:
+                success, text = futures[(side, source)].result()[(daf, side)]
+                if not success:
+                    errors.append(f"{daf}{side}: {text}")
+                elif text.strip():
+                    combined += f"--- {daf}{side} ---\n{text}\n\n"
+                else:
+                    combined += f"--- {daf}{side} ---\n{placeholder}\n\n"
+            
+            filename = self._output_filename(tractate, daf, source)
+            if errors:
+                print(f"  Not saving {filename}: {'; '.join(errors)}")
+                failed.append(source)
+                continue
+            try:
+                with self.metrics.timer('file_write_duration_seconds', source=source):
+                    written = self.store.write_text(filename, combined)
+                if written:
+                    self.metrics.inc('file_writes_total', source=source)
+                    self.metrics.inc('file_write_bytes_total', len(combined.encode('utf-8')), source=source)
+                    print(f"  Saved: {filename}")
+                else:
+                    self.metrics.inc('file_write_skips_total', source=source)
+                    print(f"  Unchanged: {filename}")
+            except Exception as e:
+                print(f"  Error saving {filename}: {e}")
+                failed.append(source)
+                continue
+            self.manifest.record(tractate, daf, source, filename, combined)
+        
+        if futures:
+            self.manifest.save_if_due()
+        return failed
+
+    def _run_pass(self, dafs: List[Tuple[str, int]], sources: List[str],
+                  pending: Optional[Dict[Tuple[str, int], List[str]]] = None) -> Dict[Tuple[str, int], List[str]]:
+        """
+        Download a sequence of (tractate, daf) pairs concurrently.
+
+        Consecutive dafs of a tractate are grouped into chunks that share ranged
+        requests. Requests for up to ``concurrency`` chunks are kept queued on the
+        thread pool at once; dafs are saved in order as soon as their requests finish.
+
+        Returns:
+            Failed sources per (tractate, daf)
+        """
+        failures = {}
+        done = 0
+        window = deque()
+        
+        def finish_oldest():
+            nonlocal done
+            tractate, futures = window.popleft()
+            for daf, daf_futures in futures.items():
+                failed = self._save_daf(tractate, daf, sources, daf_futures)
+                if failed:
+                    failures[(tractate, daf)] = failed
+                done += 1
+                print(f"Progress: {done}/{len(dafs)} dafs processed, {len(failures)} with failures")
+                print()
+        
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                for tractate, chunk in chunk_dafs(dafs, max(1, self.batch_span // len(SIDES))):
+                    window.append((tractate, self._submit_chunk(executor, tractate, chunk, sources, pending)))
+                    if len(window) >= self.concurrency:
+                        finish_oldest()
+                while window:
+                    finish_oldest()
+        finally:
+            # Dafs are recorded as they are saved but written out only every few seconds
+            self.manifest.save()
+        return failures
+
+    def _download_dafs(self, dafs: List[Tuple[str, int]], sources: List[str]) -> int:
+        """
+        Download a sequence of (tractate, daf) pairs, then retry failed units.
+
+        After the main pass, units that failed (including those deferred by an open
+        circuit breaker) get up to ``retry_passes`` further passes, each started once
+        the breakers involved are ready to accept a probe again.
+
+        Returns:
+            Number of dafs downloaded completely
+        """
+        started = time.monotonic()
+        requests_before = self.client.request_count
+        skipped_before = self.known_empty_skipped
+        
+        failures = self._run_pass(dafs, sources)
+        for attempt in range(1, self.retry_passes + 1):
+            if not failures:
+                break
+            wait = max([self.client.breaker(source).retry_in() for failed in failures.values() for source in failed] + [0])
+            units = sum(len(failed) for failed in failures.values())
+            print(f"Retry pass {attempt}/{self.retry_passes}: {units} failed units in {len(failures)} dafs"
+                  + (f" (waiting {wait:.0f}s for circuit breakers)" if wait else ""))
+            time.sleep(wait)
+            failures = self._run_pass(list(failures), sources, pending=failures)
+        
+        elapsed = max(time.monotonic() - started, 1e-9)
+        request_count = self.client.request_count - requests_before
+        print(f"Elapsed: {elapsed:.1f}s | Requests: {request_count} ({request_count / elapsed:.2f} req/s) | "
+              f"Throughput: {len(dafs) / elapsed * 60:.1f} dafs/min | "
+              f"Known-empty amudim skipped: {self.known_empty_skipped - skipped_before}")
+        hit_ratio = self.metrics.cache_hit_ratio()
+        print(f"Rate-limit wait: {self.metrics.counter('rate_limit_wait_seconds_total'):.1f}s | "
+              f"Retry backoff: {self.metrics.counter('retry_backoff_seconds_total'):.1f}s | "
+              f"Retries: {self.metrics.counter('http_retries_total'):.0f}"
+              + (f" | Cache hit ratio: {hit_ratio:.0%}" if hit_ratio is not None else ""))
+        for (tractate, daf), failed in failures.items():
+            print(f"  Failed: {tractate} {daf} ({', '.join(failed)})")
+        return len(dafs) - len(failures)
+
     def download_daf(
         self,
         tractate: str,
@@ -145,110 +584,14 @@ class DafYomiDownloader:
             print(f"Tractate '{tractate}' not found")
             return False
         
-        if daf < 2 or daf > tractate_info["daf_count"]:
-            print(f"Daf {daf} is out of range for {tractate} (2-{tractate_info['daf_count']})")
+        if not daf_sides(tractate_info, daf):
+            print(f"Daf {daf} is out of range for {tractate} ({tractate_info['first']}-{tractate_info['last']})")
             return False
         
         print(f"Downloading {tractate} {daf}...")
         
-        # Fetch both sides
-        combined_text = ""
-        combined_steinsaltz = ""
-        combined_rashi = ""
-        combined_tosafot = ""
-        sides = ['a', 'b']
-        
-        for side in sides:
-            print(f"  Fetching {daf}{side}...")
-            
-            # Fetch main text
-            success, text = self.fetch_text(tractate, daf, side, source="main")
-            if success and text.strip():
-                combined_text += f"--- {daf}{side} ---\n{text}\n\n"
-            elif success:
-                combined_text += f"--- {daf}{side} ---\n[No text available]\n\n"
-            else:
-                combined_text += f"--- {daf}{side} ---\n{text}\n\n"
-            
-            time.sleep(self.delay)
-            
-            # Fetch Steinsaltz
-            if include_steinsaltz:
-                print(f"  Fetching {daf}{side} Steinsaltz...")
-                success, commentary_text = self.fetch_text(tractate, daf, side, source="Steinsaltz")
-                if success and commentary_text.strip():
-                    combined_steinsaltz += f"--- {daf}{side} ---\n{commentary_text}\n\n"
-                elif success:
-                    combined_steinsaltz += f"--- {daf}{side} ---\n[No commentary available]\n\n"
-                else:
-                    combined_steinsaltz += f"--- {daf}{side} ---\n{commentary_text}\n\n"
-                time.sleep(self.delay)
-
-            # Fetch Rashi
-            if include_rashi:
-                print(f"  Fetching {daf}{side} Rashi...")
-                success, rashi_text = self.fetch_text(tractate, daf, side, source="Rashi")
-                if success and rashi_text.strip():
-                    combined_rashi += f"--- {daf}{side} ---\n{rashi_text}\n\n"
-                elif success:
-                    combined_rashi += f"--- {daf}{side} ---\n[No Rashi available]\n\n"
-                else:
-                    combined_rashi += f"--- {daf}{side} ---\n{rashi_text}\n\n"
-                time.sleep(self.delay)
-
-            # Fetch Tosafot
-            if include_tosafot:
-                print(f"  Fetching {daf}{side} Tosafot...")
-                success, tosafot_text = self.fetch_text(tractate, daf, side, source="Tosafot")
-                if success and tosafot_text.strip():
-                    combined_tosafot += f"--- {daf}{side} ---\n{tosafot_text}\n\n"
-                elif success:
-                    combined_tosafot += f"--- {daf}{side} ---\n[No Tosafot available]\n\n"
-                else:
-                    combined_tosafot += f"--- {daf}{side} ---\n{tosafot_text}\n\n"
-                time.sleep(self.delay)
-        
-        # Save main text
-        main_filename = os.path.join(self.output_dir, f"{tractate}_{daf}.txt")
-        try:
-            with open(main_filename, 'w', encoding='utf-8') as f:
-                f.write(combined_text)
-            print(f"  Saved: {main_filename}")
-        except Exception as e:
-            print(f"  Error saving {main_filename}: {e}")
-            return False
-        
-        # Save Steinsaltz if available
-        if include_steinsaltz and combined_steinsaltz.strip():
-            commentary_filename = os.path.join(self.output_dir, f"{tractate}_{daf}_steinsaltz.txt")
-            try:
-                with open(commentary_filename, 'w', encoding='utf-8') as f:
-                    f.write(combined_steinsaltz)
-                print(f"  Saved: {commentary_filename}")
-            except Exception as e:
-                print(f"  Error saving {commentary_filename}: {e}")
-
-        # Save Rashi if available
-        if include_rashi and combined_rashi.strip():
-            rashi_filename = os.path.join(self.output_dir, f"{tractate}_{daf}_rashi.txt")
-            try:
-                with open(rashi_filename, 'w', encoding='utf-8') as f:
-                    f.write(combined_rashi)
-                print(f"  Saved: {rashi_filename}")
-            except Exception as e:
-                print(f"  Error saving {rashi_filename}: {e}")
-
-        # Save Tosafot if available
-        if include_tosafot and combined_tosafot.strip():
-            tosafot_filename = os.path.join(self.output_dir, f"{tractate}_{daf}_tosafot.txt")
-            try:
-                with open(tosafot_filename, 'w', encoding='utf-8') as f:
-                    f.write(combined_tosafot)
-                print(f"  Saved: {tosafot_filename}")
-            except Exception as e:
-                print(f"  Error saving {tosafot_filename}: {e}")
-        
-        return True
+        sources = self._sources(include_steinsaltz, include_rashi, include_tosafot)
+        return self._download_dafs([(tractate, daf)], sources) == 1
     
     def download_tractate(self, tractate: str, start_daf: int = 2, end_daf: Optional[int] = None, 
                          include_steinsaltz: bool = True,
@@ -259,7 +602,7 @@ class DafYomiDownloader:
         
         Args:
             tractate: English name of tractate
-            start_daf: Starting daf number (default: 2)
+            start_daf: Starting daf number (default: first daf of tractate)
             end_daf: Ending daf number (default: last daf of tractate)
             include_steinsaltz: Whether to download Steinsaltz commentary
             include_rashi: Whether to download Rashi commentary
@@ -273,67 +616,189 @@ class DafYomiDownloader:
             print(f"Tractate '{tractate}' not found")
             return False
         
+        first_daf, last_daf = daf_range(tractate_info)
         if end_daf is None:
-            end_daf = tractate_info["daf_count"]
+            end_daf = last_daf
         
-        if start_daf < 2:
-            start_daf = 2
-        if end_daf > tractate_info["daf_count"]:
-            end_daf = tractate_info["daf_count"]
+        if start_daf < first_daf:
+            start_daf = first_daf
+        if end_daf > last_daf:
+            end_daf = last_daf
         
         print(f"Downloading {tractate} ({tractate_info['hebrew']}) - Dafs {start_daf} to {end_daf}")
         print(f"Steinsaltz: {'Yes' if include_steinsaltz else 'No'} | Rashi: {'Yes' if include_rashi else 'No'} | Tosafot: {'Yes' if include_tosafot else 'No'}")
+        print(f"Concurrency: {self.concurrency} | Rate: {self.rate_limiter.max_rate:g} req/s (burst {self.rate_limiter.burst})")
         print("-" * 50)
         
-        success_count = 0
         total_dafs = end_daf - start_daf + 1
-        
-        for daf in range(start_daf, end_daf + 1):
-            if self.download_daf(
-                tractate,
-                daf,
-                include_steinsaltz=include_steinsaltz,
-                include_rashi=include_rashi,
-                include_tosafot=include_tosafot,
-            ):
-                success_count += 1
-            print(f"Progress: {success_count}/{total_dafs} dafs completed")
-            print()
+        sources = self._sources(include_steinsaltz, include_rashi, include_tosafot)
+        success_count = self._download_dafs([(tractate, daf) for daf in range(start_daf, end_daf + 1)], sources)
         
         print(f"Completed: {success_count}/{total_dafs} dafs downloaded successfully")
         return success_count == total_dafs
     
+    def download_shas(self, tractates: Optional[List[str]] = None,
+                      include_steinsaltz: bool = True,
+                      include_rashi: bool = True,
+                      include_tosafot: bool = True) -> bool:
+        """
+        Download several tractates (default: the whole Shas) as a single job.
+
+        Every daf of every tractate goes through one scheduler, so the worker pool and
+        its kept-alive connections stay busy across tractate boundaries.
+
+        Args:
+            tractates: English tractate names (default: all tractates in order)
+            include_steinsaltz: Whether to download Steinsaltz commentary
+            include_rashi: Whether to download Rashi commentary
+            include_tosafot: Whether to download Tosafot commentary
+
+        Returns:
+            True if all downloads successful, False otherwise
+        """
+        infos = []
+        for name in tractates or [t["english"] for t in self.tractates]:
+            tractate_info = self.get_tractate_info(name)
+            if not tractate_info:
+                print(f"Tractate '{name}' not found")
+                return False
+            infos.append(tractate_info)
+        
+        dafs = [(info["english"], daf) for info in infos for daf in range(daf_range(info)[0], daf_range(info)[1] + 1)]
+        print(f"Downloading {len(infos)} tractates - {len(dafs)} dafs")
+        print(f"Steinsaltz: {'Yes' if include_steinsaltz else 'No'} | Rashi: {'Yes' if include_rashi else 'No'} | Tosafot: {'Yes' if include_tosafot else 'No'}")
+        print(f"Concurrency: {self.concurrency} | Rate: {self.rate_limiter.max_rate:g} req/s (burst {self.rate_limiter.burst})")
+        print("-" * 50)
+        
+        sources = self._sources(include_steinsaltz, include_rashi, include_tosafot)
+        success_count = self._download_dafs(dafs, sources)
+        
+        print(f"Completed: {success_count}/{len(dafs)} dafs downloaded successfully")
+        return success_count == len(dafs)
+    
+    def coverage_report(self, tractates: Optional[List[str]] = None):
+        """
+        Print which commentary amudim the negative cache records as having no text.
+
+        Args:
+            tractates: English tractate names (default: all tractates)
+        """
+        if not self.cache:
+            print("Coverage report needs the response cache (don't use --no-cache)")
+            return
+        print("Commentary coverage (from the negative cache):")
+        print("-" * 50)
+        for name in tractates or [t["english"] for t in self.tractates]:
+            tractate_info = self.get_tractate_info(name)
+            if not tractate_info:
+                print(f"Tractate '{name}' not found")
+                continue
+            first_daf, last_daf = daf_range(tractate_info)
+            total = sum(len(daf_sides(tractate_info, daf)) for daf in range(first_daf, last_daf + 1))
+            print(f"{tractate_info['english']} ({total} amudim)")
+            for source, _, _ in COMMENTARIES:
+                empty = self.cache.known_empty(self.client.cache_key(self._ref(tractate_info["english"], source, "")))
+                empty_amudim = ", ".join(ref.rsplit(".", 1)[-1] for ref in empty)
+                print(f"  {source:12} {len(empty)}/{total} amudim known empty" + (f": {empty_amudim}" if empty else ""))
+    
     def list_tractates(self):
         """List all available tractates."""
         print("Available Tractates:")
         print("-" * 50)
-        for i, tractate in enumerate(TRACTATES, 1):
-            print(f"{i:2d}. {tractate['english']:15} ({tractate['hebrew']:12}) - {tractate['daf_count']} dafs")
+        for i, tractate in enumerate(self.tractates, 1):
+            print(f"{i:2d}. {tractate['english']:15} ({tractate['hebrew']:12}) - {tractate['first']}-{tractate['last']}")
 
 def main():
     parser = argparse.ArgumentParser(description='Automated Daf Yomi Downloader')
     parser.add_argument('--tractate', '-t', help='Tractate name (English)')
+    parser.add_argument('--tractates', help='Comma-separated tractate names to download as one job')
+    parser.add_argument('--all', action='store_true', help='Download the whole Shas as one job')
     parser.add_argument('--daf', '-d', type=int, help='Specific daf number')
-    parser.add_argument('--start', '-s', type=int, default=2, help='Start daf (default: 2)')
+    parser.add_argument('--start', '-s', type=int, default=2, help='Start daf (default: first daf of tractate)')
     parser.add_argument('--end', '-e', type=int, help='End daf (default: last daf)')
     parser.add_argument('--output', '-o', default='downloads', help='Output directory (default: downloads)')
     parser.add_argument('--no-commentary', action='store_true', help='Skip Steinsaltz commentary')  # legacy flag
     parser.add_argument('--no-steinsaltz', action='store_true', help='Skip Steinsaltz commentary')
     parser.add_argument('--no-rashi', action='store_true', help='Skip Rashi commentary')
     parser.add_argument('--no-tosafot', action='store_true', help='Skip Tosafot commentary')
-    parser.add_argument('--delay', type=float, default=1.0, help='Delay between requests in seconds (default: 1.0)')
+    parser.add_argument('--rate', type=float, default=2.0, help='Maximum requests per second across all workers (default: 2.0)')
+    parser.add_argument('--burst', type=int, default=4, help='Requests allowed back-to-back before --rate applies (default: 4)')
+    parser.add_argument('--delay', type=float, help='Legacy: minimum seconds between requests (same as --rate 1/DELAY --burst 1)')
+    parser.add_argument('--concurrency', '-c', type=int, default=4, help='Number of parallel requests (default: 4)')
+    parser.add_argument('--batch-span', type=int, default=2,
+                        help='Adjacent amudim fetched per ranged request; 1 disables batching (default: 2)')
+    parser.add_argument('--retries', type=int, default=4, help='Attempts per request before giving up (default: 4)')
+    parser.add_argument('--retry-passes', type=int, default=1,
+                        help='Extra passes over failed units at the end of the run (default: 1)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='Response cache file (default: .cache/sefaria.sqlite)')
+    parser.add_argument('--no-cache', action='store_true', help='Always fetch from Sefaria, bypassing the response cache')
+    parser.add_argument('--cache-ttl', type=float, default=7.0, help='Days a cached response is used without revalidation (default: 7)')
+    parser.add_argument('--negative-ttl', type=float, default=30.0,
+                        help='Days a commentary amud known to be empty is skipped before being checked again (default: 30)')
+    parser.add_argument('--coverage', action='store_true',
+                        help='Report commentary amudim known to be empty for the selected tractates and exit')
+    parser.add_argument('--cache-size', type=int, default=500, help='Maximum cache size in MB (default: 500)')
+    parser.add_argument('--store', default=DEFAULT_STORE_PATH,
+                        help='Content-addressed store output files are deduplicated through (default: .cache/objects)')
+    parser.add_argument('--no-store', action='store_true', help='Write output files directly, without the artifact store')
+    parser.add_argument('--resume', '--skip-existing', dest='resume', action='store_true',
+                        help='Skip dafs/commentaries already recorded as complete in the output manifest')
     parser.add_argument('--list', '-l', action='store_true', help='List all tractates')
+    parser.add_argument('--refresh-catalog', action='store_true',
+                        help="Update each tractate's last amud from Sefaria's index API and cache it")
+    parser.add_argument('--metrics', action='append', default=[], metavar='PATH',
+                        help='Write run metrics to PATH (Prometheus text if it ends in .prom, else JSON); repeatable')
+    parser.add_argument('--metrics-interval', type=float, default=0,
+                        help='Also rewrite the --metrics files every N seconds during the run (default: only at the end)')
     
     args = parser.parse_args()
     
-    downloader = DafYomiDownloader(output_dir=args.output, delay=args.delay)
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(args.cache, ttl=args.cache_ttl * 24 * 3600, max_bytes=args.cache_size * 1024 * 1024,
+                              negative_ttl=args.negative_ttl * 24 * 3600)
+    
+    downloader = DafYomiDownloader(
+        output_dir=args.output,
+        delay=args.delay,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        burst=args.burst,
+        cache=cache,
+        resume=args.resume,
+        batch_span=args.batch_span,
+        retry_policy=RetryPolicy(max_attempts=args.retries),
+        retry_passes=args.retry_passes,
+        store=None if args.no_store else ArtifactStore(args.store),
+    )
+    
+    dumper = PeriodicDump(downloader.metrics, args.metrics, args.metrics_interval).start() if args.metrics else None
+    try:
+        run(args, downloader)
+    finally:
+        if dumper:
+            dumper.stop()
+
+
+def run(args, downloader: DafYomiDownloader):
+    if args.refresh_catalog:
+        print(f"Refreshed {downloader.refresh_catalog()} tractates from Sefaria's index")
+        if not (args.tractate or args.tractates or args.all or args.list):
+            return
     
     if args.list:
         downloader.list_tractates()
         return
     
-    if not args.tractate:
-        print("Please specify a tractate with --tractate or use --list to see available tractates")
+    if args.coverage:
+        names = [args.tractate] if args.tractate else None
+        if args.tractates:
+            names = [name.strip() for name in args.tractates.split(',') if name.strip()]
+        downloader.coverage_report(names)
+        return
+    
+    if not (args.tractate or args.tractates or args.all):
+        print("Please specify a tractate with --tractate (or --tractates / --all) or use --list to see available tractates")
         downloader.list_tractates()
         return
     
@@ -342,7 +807,22 @@ def main():
     include_rashi = not args.no_rashi
     include_tosafot = not args.no_tosafot
     
-    if args.daf:
+    if args.all or args.tractates:
+        # Download several tractates in one scheduler
+        names = None if args.all else [name.strip() for name in args.tractates.split(',') if name.strip()]
+        success = downloader.download_shas(
+            names,
+            include_steinsaltz=include_steinsaltz,
+            include_rashi=include_rashi,
+            include_tosafot=include_tosafot,
+        )
+        label = "the whole Shas" if args.all else ", ".join(names)
+        if success:
+            print(f"\n✓ Successfully downloaded {label}")
+        else:
+            print(f"\n✗ Some downloads failed for {label}")
+            sys.exit(1)
+    elif args.daf:
         # Download single daf
         success = downloader.download_daf(
             args.tractate,
@@ -3,115 +3,100 @@
 הורדת כל שמונה הקבצים של הרב קוק ואיחודם לקובץ אחד
 """
 
-import requests
 import os
-import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from artifact_store import default_store
+from file_download import download_file, find_source
+from pdf_tools import extract_text, merge_pdfs
 
-def download_all_shmona_kevatzim():
+# מספר URL-ים אפשריים, לפי סדר עדיפות
+MIRRORS = [
+    "https://www.daat.ac.il/daat/vl/shmona/shmona{:02d}.pdf",
+    "https://www.daat.ac.il/daat/vl/shmona/shmona{:d}.pdf",
+    "https://www.daat.ac.il/daat/vl/shmona/kovetz{:d}.pdf",
+]
+
+def download_kovetz(session, store, number, current_dir):
+    """
+    בודק את כל המקורות במקביל ומוריד את הקובץ מהראשון שיש בו אותו, ישירות לדיסק.
+    מחזיר את גודל הקובץ, או None אם הוא לא נמצא באף מקור.
+    """
+    source = find_source(session, [template.format(number) for template in MIRRORS])
+    if not source:
+        print(f"  לא נמצא קובץ {number} באף אחד מהמקורות")
+        return None
+    filename = f"shmona_kovetz_{number}.pdf"
+    size = download_file(session, source, os.path.join(current_dir, filename), store=store)
+    print(f"  קובץ {number} הורד בהצלחה מ-{source.url} ({size} bytes) -> {filename}")
+    return size
+
+def download_all_shmona_kevatzim(workers=4):
     print("מוריד את כל שמונה הקבצים של הרב קוק...")
+    current_dir = os.path.dirname(os.path.abspath(__file__))
     
-    # נסה מספר URL-ים אפשריים
-    base_urls = [
-        "https://www.daat.ac.il/daat/vl/shmona/shmona{:02d}.pdf",
-        "https://www.daat.ac.il/daat/vl/shmona/shmona{:d}.pdf",
-        "https://www.daat.ac.il/daat/vl/shmona/kovetz{:d}.pdf",
-    ]
-    all_pdfs = []
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=workers * len(MIRRORS))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # קבצים זהים (גם כאלה שהורדו בסקריפטים אחרים) נשמרים על הדיסק פעם אחת
+    store = default_store()
     
-    # הורד את כל 8 הקבצים
-    for i in range(1, 9):
-        print(f"מוריד קובץ {i}...")
-        downloaded = False
-        
-        # נסה מספר URL-ים אפשריים
-        for base_url_template in base_urls:
+    # הורד את כל 8 הקבצים במקביל; קובץ שהורדתו נקטעה ימשיך מאיפה שהפסיק
+    sizes = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {i: executor.submit(download_kovetz, session, store, i, current_dir) for i in range(1, 9)}
+        for i, future in futures.items():
             try:
-                url = base_url_template.format(i)
-                response = requests.get(url, timeout=60)
-                if response.ok and len(response.content) > 1000:  # ודא שזה לא דף שגיאה
-                    all_pdfs.append({
-                        'number': i,
-                        'content': response.content,
-                        'size': len(response.content)
-                    })
-                    print(f"  קובץ {i} הורד בהצלחה מ-{url} ({len(response.content)} bytes)")
-                    downloaded = True
-                    break
+                size = future.result()
             except Exception as e:
+                print(f"  שגיאה בהורדת קובץ {i}: {e}")
                 continue
-        
-        if not downloaded:
-            print(f"  לא נמצא קובץ {i} באף אחד מהמקורות")
-            all_pdfs.append({
-                'number': i,
-                'content': None,
-                'size': 0
-            })
-        
-        # המתן קצת בין הורדות
-        time.sleep(0.5)
+            if size:
+                sizes[i] = size
     
-    if not all_pdfs:
+    if not sizes:
         print("לא הורדו קבצים!")
         return
     
-    # שמור כל קובץ בנפרד
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    print("\nשומר קבצים נפרדים...")
-    for pdf_data in all_pdfs:
-        if pdf_data['content']:
-            filename = f"shmona_kovetz_{pdf_data['number']}.pdf"
-            file_path = os.path.join(current_dir, filename)
-            with open(file_path, 'wb') as f:
-                f.write(pdf_data['content'])
-            print(f"  נשמר: {filename}")
+    pdf_paths = [os.path.join(current_dir, f"shmona_kovetz_{i}.pdf") for i in sorted(sizes)]
+    merged_path = os.path.join(current_dir, 'shmona_kevatzim_all.pdf')
     
-    # אגד את כל הקבצים לקובץ PDF אחד
+    # אגד את כל הקבצים לקובץ PDF אחד, ישירות מהקבצים שעל הדיסק
     print("\nמאחד את כל הקבצים לקובץ אחד...")
     
+    inputs = [(f"קובץ {i}", pdf_path) for i, pdf_path in zip(sorted(sizes), pdf_paths)]
     try:
-        # נסה להשתמש ב-PyPDF2 או pypdf לאיחוד הקבצים
-        try:
-            from PyPDF2 import PdfMerger
-            merger = PdfMerger()
-            
-            for pdf_data in all_pdfs:
-                if pdf_data['content']:
-                    import io
-                    pdf_file = io.BytesIO(pdf_data['content'])
-                    merger.append(pdf_file)
-            
-            merged_path = os.path.join(current_dir, 'shmona_kevatzim_all.pdf')
-            with open(merged_path, 'wb') as output_file:
-                merger.write(output_file)
-            
+        if merge_pdfs(inputs, merged_path, store):
             print(f"הקובץ המאוחד נשמר: shmona_kevatzim_all.pdf")
             print(f"גודל: {os.path.getsize(merged_path)} bytes")
-            
-        except ImportError:
-            # אם PyPDF2 לא מותקן, פשוט שמור את כל הקבצים כקובץ בינארי אחד
-            print("PyPDF2 לא מותקן. מאחד את הקבצים כקובץ בינארי...")
-            merged_path = os.path.join(current_dir, 'shmona_kevatzim_all.bin')
-            with open(merged_path, 'wb') as output_file:
-                for pdf_data in all_pdfs:
-                    if pdf_data['content']:
-                        # כתוב מספר הקובץ
-                        output_file.write(f"=== KOVETZ {pdf_data['number']} ===\n".encode('utf-8'))
-                        output_file.write(pdf_data['content'])
-                        output_file.write(b"\n\n")
-            
-            print(f"הקובץ המאוחד נשמר: shmona_kevatzim_all.bin")
-            print(f"גודל: {os.path.getsize(merged_path)} bytes")
-            print("הערה: זהו קובץ בינארי. להתקנת PyPDF2 להמרה ל-PDF: pip install PyPDF2")
-            
+        else:
+            print("הקבצים לא השתנו מאז האיחוד הקודם; shmona_kevatzim_all.pdf לא נבנה מחדש")
+    except ImportError:
+        print("לאיחוד הקבצים ל-PDF אחד יש להתקין pypdf: pip install pypdf")
+        print("הקבצים נשמרו בנפרד.")
     except Exception as e:
         print(f"שגיאה באיחוד הקבצים: {e}")
         print("הקבצים נשמרו בנפרד.")
     
+    # חלץ את הטקסט של כל העמודים (במקביל, בכמה תהליכים) לקובץ טקסט אחד
+    print("\nמחלץ את הטקסט מהקבצים...")
+    text_path = os.path.join(current_dir, 'shmona_kevatzim_daat.txt')
+    try:
+        if extract_text(inputs, text_path, store=store):
+            print(f"הטקסט נשמר: shmona_kevatzim_daat.txt (מיקומי העמודים ב-shmona_kevatzim_daat.txt.offsets.json)")
+        else:
+            print("הקבצים לא השתנו מאז החילוץ הקודם; shmona_kevatzim_daat.txt לא נבנה מחדש")
+    except ImportError:
+        print("לחילוץ הטקסט יש להתקין pypdf: pip install pypdf")
+    except Exception as e:
+        print(f"שגיאה בחילוץ הטקסט: {e}")
+    
     print("\nסיכום:")
-    total_size = sum(pdf['size'] for pdf in all_pdfs if pdf['content'])
-    print(f"סה\"כ הורדו: {len([p for p in all_pdfs if p['content']])} קבצים")
+    total_size = sum(sizes.values())
+    print(f"סה\"כ הורדו: {len(sizes)} קבצים")
     print(f"גודל כולל: {total_size} bytes ({total_size / 1024 / 1024:.2f} MB)")
 
 if __name__ == "__main__":
@@ -3,57 +3,27 @@
 הורדת הספר "השם רועי" מאתר ויקיטקסט
 """
 
-import requests
 from bs4 import BeautifulSoup
 import re
 import os
-import time
 
-def get_wikisource_content(url):
+from crawl_frontier import Frontier, crawl
+from wikisource_client import WikisourceClient, normalize_page_url
+from wikisource_html import extract_page
+
+def get_wikisource_content(client, url):
     """משוך תוכן מוויקיטקסט"""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'he,en-US;q=0.9,en;q=0.8'
-        }
-        # המתן לפני כל בקשה
-        time.sleep(2)
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        return response.text
+        return client.get(url).text
     except Exception as e:
         print(f"שגיאה בקבלת {url}: {e}")
         return None
 
 def extract_text_from_wikisource(html_content):
-    """חלץ טקסט מתוכן HTML של ויקיטקסט"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # מצא את התוכן הראשי
-    content_div = soup.find('div', {'id': 'mw-content-text'}) or soup.find('div', {'class': 'mw-parser-output'})
-    
-    if not content_div:
-        return None
-    
-    # הסר אלמנטים לא רצויים
-    for element in content_div.find_all(['script', 'style', 'nav', 'table', 'div', 'span']):
-        if element.get('class') and any(cls in ['navbox', 'toc', 'mw-editsection'] for cls in element.get('class', [])):
-            element.decompose()
-    
-    # חלץ טקסט
-    text = content_div.get_text(separator='\n', strip=True)
-    
-    # נקה טקסט
-    lines = []
-    for line in text.split('\n'):
-        line = line.strip()
-        if line and len(line) > 2:  # התעלם משורות קצרות מדי
-            lines.append(line)
-    
-    return '\n'.join(lines)
+    """חלץ טקסט מתוכן HTML של ויקיטקסט (ללא תיבות ניווט, תוכן עניינים וקישורי עריכה)"""
+    return extract_page(html_content).text
 
-def find_book_pages(base_url, book_name):
+def find_book_pages(client, base_url, book_name):
     """מצא את כל הדפים של הספר"""
     # נסה למצוא את דף הספר
     book_urls = []
@@ -67,7 +37,7 @@ def find_book_pages(base_url, book_name):
     ]
     
     # נסה גם דרך דף המחבר
-    author_page = get_wikisource_content("https://he.wikisource.org/wiki/מחבר:אוריאל_ספז")
+    author_page = get_wikisource_content(client, "https://he.wikisource.org/wiki/מחבר:אוריאל_ספז")
     if author_page:
         soup = BeautifulSoup(author_page, 'html.parser')
         # חפש קישורים לספר
@@ -82,54 +52,53 @@ def find_book_pages(base_url, book_name):
     
     return book_urls
 
-def find_all_book_pages(start_url):
-    """מצא את כל הדפים של הספר החל מדף ראשי"""
-    visited = set()
-    pages_to_visit = [start_url]
-    all_pages = []
-    
-    while pages_to_visit:
-        current_url = pages_to_visit.pop(0)
-        if current_url in visited:
-            continue
-        
-        visited.add(current_url)
-        print(f"בודק: {current_url}")
-        
-        content = get_wikisource_content(current_url)
-        if not content:
-            continue
-        
-        soup = BeautifulSoup(content, 'html.parser')
-        
-        # חלץ את התוכן של הדף הנוכחי
-        text = extract_text_from_wikisource(content)
-        if text:
-            all_pages.append((current_url, text))
-            print(f"  נמצא תוכן ({len(text)} תווים)")
-        
-        # חפש קישורים לדפים נוספים של הספר
-        content_div = soup.find('div', {'id': 'mw-content-text'}) or soup.find('div', {'class': 'mw-parser-output'})
-        if content_div:
-            links = content_div.find_all('a', href=True)
-            for link in links:
-                href = link.get('href', '')
-                link_text = link.get_text().strip()
-                
+def find_all_book_pages(client, start_url, checkpoint_path=None, workers=2):
+    """
+    מצא את כל הדפים של הספר החל מדף ראשי.
+    כתובות מנורמלות (קידוד אחוזים, רווח/קו תחתון), כך שאף דף לא נבדק פעמיים;
+    הדפים שנבדקו נרשמים ב-checkpoint_path, כך שהרצה שנקטעה ממשיכה מאיפה שעצרה.
+    דף שההורדה שלו נכשלה לא נרשם, וההרצה הבאה תוריד אותו שוב.
+    """
+    frontier = Frontier(checkpoint_path, key=normalize_page_url)
+    if frontier.resumed:
+        print(f"ממשיך הורדה קודמת: {frontier.resumed} דפים כבר נבדקו")
+    frontier.add(normalize_page_url(start_url))
+    
+    def visit(batch):
+        finished = []
+        for current_url in batch:
+            print(f"בודק: {current_url}")
+            # שגיאה כאן מסמנת את הדף כנכשל (ולא כגמור), כך שה-checkpoint נשמר
+            content = client.get(current_url).text
+            
+            # הטקסט של הדף והקישורים שבו - מניתוח אחד של ה-HTML
+            page = extract_page(content)
+            if page.text:
+                print(f"  נמצא תוכן ({len(page.text)} תווים)")
+            
+            # חפש קישורים לדפים נוספים של הספר
+            found = []
+            for href in page.links:
+                full_url = normalize_page_url(href, current_url)
                 # אם זה קישור לדף אחר של הספר
-                if href.startswith('/wiki/') and 'השם_רועי' in href:
-                    full_url = f"https://he.wikisource.org{href}"
-                    if full_url not in visited and full_url not in pages_to_visit:
-                        pages_to_visit.append(full_url)
-                        print(f"  נמצא קישור נוסף: {link_text} -> {full_url}")
-        
-        time.sleep(2)  # המתן בין בקשות (כדי לא להעמיס על השרת)
-    
-    return all_pages
+                if href.startswith('/wiki/') and 'השם_רועי' in full_url:
+                    found.append(full_url)
+            finished.append((current_url, page.text, found))
+        return finished
+    
+    failed = crawl(frontier, visit, workers=workers)
+    frontier.close(remove=not failed and checkpoint_path is not None)
+    if failed:
+        print(f"{len(failed)} דפים לא הורדו; הרצה חוזרת תמשיך מאיפה שעצרה")
+    
+    return [(url, text) for url, text in frontier.results.items() if text]
 
 def download_book():
     print("מתחיל להוריד את הספר 'השם רועי'...")
     
+    # כל הבקשות עוברות דרך לקוח אחד: ההורדה מאטה רק כשוויקיטקסט מבקש (Retry-After, 429/503)
+    client = WikisourceClient()
+    
     # נסה למצוא את דף הספר הראשי
     base_urls = [
         "https://he.wikisource.org/wiki/השם_רועי",
@@ -140,7 +109,7 @@ def download_book():
     author_url = "https://he.wikisource.org/wiki/מחבר:אוריאל_ספז"
     print(f"בודק דף המחבר: {author_url}")
     
-    author_content = get_wikisource_content(author_url)
+    author_content = get_wikisource_content(client, author_url)
     start_url = None
     
     if author_content:
@@ -159,7 +128,7 @@ def download_book():
         # נסה את ה-URL-ים הישירים
         for url in base_urls:
             print(f"מנסה URL ישיר: {url}")
-            content = get_wikisource_content(url)
+            content = get_wikisource_content(client, url)
             if content:
                 start_url = url
                 break
@@ -171,7 +140,8 @@ def download_book():
     print(f"\nמתחיל להוריד מהדף: {start_url}")
     
     # מצא את כל הדפים
-    all_pages = find_all_book_pages(start_url)
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    all_pages = find_all_book_pages(client, start_url, os.path.join(current_dir, 'hashem_roei.txt.crawl.jsonl'))
     
     if not all_pages:
         print("לא נמצאו דפים")
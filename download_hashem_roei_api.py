@@ -3,128 +3,88 @@
 הורדת הספר "השם רועי" מאתר ויקיטקסט באמצעות API
 """
 
-import requests
-import json
-import time
 import os
 import re
-from urllib.parse import quote
 
-def get_wikisource_api_content(title):
-    """משוך תוכן מוויקיטקסט באמצעות API"""
-    base_url = "https://he.wikisource.org/w/api.php"
-    
-    params = {
-        'action': 'query',
-        'format': 'json',
-        'prop': 'revisions',
-        'rvprop': 'content',
-        'rvslots': 'main',
-        'titles': title,
-        'formatversion': '2'
-    }
-    
+from crawl_frontier import Frontier, crawl
+from wikisource_client import MAX_TITLES, WikisourceClient, normalize_title
+from wikitext import clean_wikitext
+
+BOOK = "השם רועי"
+
+def get_wikisource_api_content(client, title):
+    """משוך תוכן של דף אחד מוויקיטקסט באמצעות API"""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'application/json',
-            'Accept-Language': 'he,en-US;q=0.9,en;q=0.8'
-        }
-        time.sleep(5)  # המתן ארוך מאוד בין בקשות
-        response = requests.get(base_url, params=params, headers=headers, timeout=30)
-        
-        if response.status_code == 403:
-            print(f"  שגיאת rate limiting. ממתין 30 שניות...")
-            time.sleep(30)
-            # נסה שוב
-            response = requests.get(base_url, params=params, headers=headers, timeout=30)
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        pages = data.get('query', {}).get('pages', [])
-        if pages and len(pages) > 0:
-            revisions = pages[0].get('revisions', [])
-            if revisions and len(revisions) > 0:
-                return revisions[0].get('slots', {}).get('main', {}).get('content', '')
-        
-        return None
+        return client.page_contents([title]).get(title)
     except Exception as e:
         print(f"שגיאה בקבלת {title}: {e}")
-        if "403" in str(e) or "rate" in str(e).lower():
-            print("  נסה להמתין כמה דקות ולנסות שוב")
         return None
 
-def clean_wikitext(text):
-    """נקה טקסט מוויקי markup"""
-    if not text:
-        return ""
-    
-    # הסר תבניות ויקי
-    text = re.sub(r'\{\{[^}]+\}\}', '', text)
-    # הסר קישורים
-    text = re.sub(r'\[\[([^\|]+)\|([^\]]+)\]\]', r'\2', text)
-    text = re.sub(r'\[\[([^\]]+)\]\]', r'\1', text)
-    # הסר תגי HTML
-    text = re.sub(r'<[^>]+>', '', text)
-    # הסר תגי ref
-    text = re.sub(r'<ref[^>]*>.*?</ref>', '', text, flags=re.DOTALL)
-    # נקה שורות ריקות מרובות
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    return text.strip()
+def is_book_page(title):
+    """האם זה דף של הספר (הכותרת מנורמלת, כך ש-_ ורווח נחשבים אותו דבר)"""
+    return BOOK in normalize_title(title)
 
-def find_all_pages(start_title):
-    """מצא את כל הדפים של הספר"""
-    visited = set()
-    pages_to_visit = [start_title]
-    all_pages = []
-    
-    while pages_to_visit:
-        current_title = pages_to_visit.pop(0)
-        if current_title in visited:
-            continue
-        
-        visited.add(current_title)
-        print(f"מוריד: {current_title}")
-        
-        content = get_wikisource_api_content(current_title)
-        if content:
-            cleaned = clean_wikitext(content)
+def book_links(content):
+    """קישורים לדפים נוספים של הספר מתוך טקסט ויקי"""
+    links = re.findall(r'\[\[([^\]]+)\]\]', content)
+    return [normalize_title(link.split('|')[0]) for link in links if is_book_page(link.split('|')[0])]
+
+def find_all_pages(client, start_title, checkpoint_path=None, workers=2):
+    """
+    מצא את כל הדפים של הספר והורד אותם, עד 50 דפים בבקשה אחת.
+    הדפים שהורדו נרשמים ב-checkpoint_path, כך שהרצה שנקטעה ממשיכה מאיפה שעצרה.
+    """
+    frontier = Frontier(checkpoint_path, key=normalize_title)
+    if frontier.resumed:
+        print(f"ממשיך הורדה קודמת: {frontier.resumed} דפים כבר הורדו")
+    
+    start_title = normalize_title(start_title)
+    try:
+        # דפי המשנה של הספר והדפים שהדף הראשי מקשר אליהם - בכמה בקשות בלבד
+        titles = [start_title] + client.subpages(start_title)
+        titles += [title for title in client.links([start_title]) if is_book_page(title)]
+    except Exception as e:
+        print(f"שגיאה בחיפוש דפי הספר: {e}")
+        titles = [start_title]
+    new = [title for title in titles if frontier.add(title)]
+    print(f"נמצאו {len(new)} דפים חדשים")
+    
+    def visit(batch):
+        print(f"מוריד {len(batch)} דפים...")
+        contents = client.page_contents(batch)
+        finished = []
+        for title in batch:
+            content = contents.get(title)
+            cleaned = clean_wikitext(content) if content else ""
             if cleaned:
-                all_pages.append((current_title, cleaned))
-                print(f"  הורד בהצלחה ({len(cleaned)} תווים)")
-            
-            # חפש קישורים לדפים נוספים
-            links = re.findall(r'\[\[([^\]]+)\]\]', content)
-            for link in links:
-                link_parts = link.split('|')
-                link_title = link_parts[0].strip()
-                
-                # אם זה קישור לדף אחר של הספר
-                if 'השם_רועי' in link_title or 'השם רועי' in link_title:
-                    if link_title not in visited and link_title not in pages_to_visit:
-                        pages_to_visit.append(link_title)
-                        print(f"  נמצא קישור נוסף: {link_title}")
-        
-        time.sleep(5)  # המתן ארוך בין בקשות
+                print(f"  {title}: הורד בהצלחה ({len(cleaned)} תווים)")
+            finished.append((title, cleaned, book_links(content) if content else []))
+        return finished
     
-    return all_pages
+    failed = crawl(frontier, visit, workers=workers, batch_size=MAX_TITLES)
+    frontier.close(remove=not failed and checkpoint_path is not None)
+    if failed:
+        print(f"{len(failed)} דפים לא הורדו; הרצה חוזרת תמשיך מאיפה שעצרה")
+    
+    return [(title, text) for title, text in frontier.results.items() if text]
 
 def download_book():
     print("מתחיל להוריד את הספר 'השם רועי'...")
     
     # נסה למצוא את דף הספר הראשי
+    # הכותרות מנורמלות, כך שאין צורך לנסות גם את הגרסה עם קו תחתון
     start_titles = [
-        "השם_רועי",
         "השם רועי",
     ]
     
+    client = WikisourceClient()
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    checkpoint_path = os.path.join(current_dir, 'hashem_roei.txt.crawl.jsonl')
     all_pages = []
     
     for title in start_titles:
         print(f"\nמנסה: {title}")
-        pages = find_all_pages(title)
+        pages = find_all_pages(client, title, checkpoint_path)
         if pages:
             all_pages = pages
             break
@@ -132,7 +92,7 @@ def download_book():
     if not all_pages:
         print("לא נמצאו דפים. מנסה דרך דף המחבר...")
         # נסה דרך דף המחבר
-        author_content = get_wikisource_api_content("מחבר:אוריאל_ספז")
+        author_content = get_wikisource_api_content(client, "מחבר:אוריאל ספז")
         if author_content:
             # חפש קישורים לספר
             links = re.findall(r'\[\[([^\]]+)\]\]', author_content)
@@ -141,7 +101,7 @@ def download_book():
                 link_title = link_parts[0].strip()
                 if 'רועי' in link_title:
                     print(f"נמצא קישור: {link_title}")
-                    pages = find_all_pages(link_title)
+                    pages = find_all_pages(client, link_title, checkpoint_path)
                     if pages:
                         all_pages = pages
                         break
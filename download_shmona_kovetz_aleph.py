@@ -3,34 +3,37 @@
 הורדת קובץ א' של 'שמונה קבצים' (הרב קוק) כ-PDF מאתר דעת
 """
 
-import requests
 import os
 
+import requests
+
+from artifact_store import default_store
+from file_download import download_file, probe
+
 
 def download_kovetz_aleph():
     print("מוריד את קובץ א' של 'שמונה קבצים' (הרב קוק)...")
 
     url = "https://www.daat.ac.il/daat/vl/shmona/shmona01.pdf"
+    out_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shmona_kovetz_aleph.pdf")
 
-    try:
-        resp = requests.get(url, timeout=60)
-        resp.raise_for_status()
-    except Exception as e:
-        print("שגיאה בהורדה:", e)
+    session = requests.Session()
+    source = probe(session, url)
+    if not source:
+        print("שגיאה בהורדה: הקובץ לא נמצא", url)
         return
 
-    out_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shmona_kovetz_aleph.pdf")
-
+    # הקובץ נכתב לדיסק בחלקים; הורדה שנקטעה תמשיך מאיפה שהפסיקה.
+    # הקובץ זהה ל-shmona_kovetz_1.pdf, ולכן שניהם חולקים עותק אחד במאגר
     try:
-        with open(out_path, "wb") as f:
-            f.write(resp.content)
+        size = download_file(session, source, out_path, store=default_store())
     except Exception as e:
-        print("שגיאה בשמירת הקובץ:", e)
+        print("שגיאה בהורדה:", e)
         return
 
     print("הקובץ נשמר בהצלחה:")
     print(out_path)
-    print("גודל:", len(resp.content), "bytes")
+    print("גודל:", size, "bytes")
 
 
 if __name__ == "__main__":
@@ -3,58 +3,50 @@
 הורדת כל ספר תהילים מ-Sefaria API
 """
 
-import requests
-import json
-import time
+import os
 
-def download_tehillim():
+from artifact_store import default_store
+from sefaria_client import default_client, flatten_text
+
+def download_tehillim(span=None):
+    """
+    span: מספר הפרקים בכל בקשה (ברירת מחדל: כל הספר בבקשה אחת)
+    """
     print("מוריד את ספר תהילים...")
+    client = default_client()
 
-    # קבל את מבנה הספר תהילים
-    response = requests.get('https://www.sefaria.org/api/v2/raw/index/Psalms')
-    if not response.ok:
+    # קבל את מבנה הספר תהילים ותכנן לפיו את הבקשות
+    chapter_count = client.section_count('Psalms')
+    if not chapter_count:
         print("שגיאה בקבלת מבנה הספר")
         return
 
-    data = response.json()
-    print(f"יש {len(data.get('schema', {}).get('nodes', []))} פרקים")
-
-    all_text = []
-
-    # הורד את כל הפרקים (1-150)
-    for i in range(1, 151):
-        print(f"מוריד פרק {i}...")
-        text_response = requests.get(f'https://www.sefaria.org/api/texts/Psalms.{i}?lang=he&commentary=0&context=0')
-
-        if text_response.ok:
-            text_data = text_response.json()
-            hebrew_text = text_data.get('he', [])
+    print(f"יש {chapter_count} פרקים")
 
-            if isinstance(hebrew_text, list):
-                hebrew_text = '\n\n'.join(hebrew_text)
-            elif isinstance(hebrew_text, str):
-                pass  # כבר string
-            else:
-                hebrew_text = str(hebrew_text)
+    # הורד את כל הפרקים בבקשה אחת (או בטווחים) ופצל לפרקים מקומית.
+    # רק אם השרת מסרב לטווח, הפרקים יורדו אחד אחד במקביל
+    chapters = client.fetch_sections('Psalms', chapter_count, span)
 
-            all_text.append(f"--- פרק {i} ---\n{hebrew_text}")
-        else:
+    all_text = []
+    for i, hebrew_text in chapters.items():
+        if hebrew_text is None:
             print(f"שגיאה בהורדת פרק {i}")
             all_text.append(f"--- פרק {i} ---\n[שגיאה בהורדת הפרק]")
-
-        # המתן קצת כדי לא להעמיס על השרת
-        time.sleep(0.5)
+        else:
+            chapter_text = flatten_text(hebrew_text, '\n\n')
+            all_text.append(f"--- פרק {i} ---\n{chapter_text}")
 
     # שמור לקובץ
-    import os
     current_dir = os.path.dirname(os.path.abspath(__file__))
     file_path = os.path.join(current_dir, 'tehillim_full.txt')
 
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write('\n\n\n'.join(all_text))
-
-    print("הקובץ tehillim_full.txt נשמר בהצלחה!")
-    print(f"גודל הקובץ: {len('\n\n\n'.join(all_text))} תווים")
+    combined_text = '\n\n\n'.join(all_text)
+    # קובץ זהה לקיים לא נכתב מחדש
+    if default_store().write_text(file_path, combined_text):
+        print("הקובץ tehillim_full.txt נשמר בהצלחה!")
+    else:
+        print("הקובץ tehillim_full.txt לא השתנה")
+    print(f"גודל הקובץ: {len(combined_text)} תווים")
 
 if __name__ == "__main__":
     download_tehillim()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Streaming file downloads with mirror probing and HTTP Range resume.
+
+``probe`` checks a candidate URL without downloading it (HEAD, or a 1 KB range GET
+when the server doesn't answer HEAD usefully). ``find_source`` probes every mirror
+of a file at once and picks the first one, in preference order, that has it.
+``download_file`` streams the body to ``<path>.part`` one chunk at a time and, when
+a transfer breaks, continues from the bytes already on disk with a Range request,
+so memory stays at one chunk however large the file is.
+"""
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional
+
+import requests
+
+from artifact_store import ArtifactStore
+from retry import RetryPolicy, is_retryable
+
+CHUNK_SIZE = 64 * 1024
+
+# Anything smaller is an error page, not the file
+MIN_SIZE = 1000
+
+
+class Source(NamedTuple):
+    url: str
+    size: Optional[int]  # total size, if the server told us
+    accepts_ranges: bool
+
+
+def _is_html(response: requests.Response) -> bool:
+    return 'text/html' in response.headers.get('Content-Type', '')
+
+
+def probe(session: requests.Session, url: str, timeout: float = 30.0) -> Optional[Source]:
+    """Check whether a URL serves a real file (not an error page), without downloading it."""
+    try:
+        response = session.head(url, timeout=timeout, allow_redirects=True)
+        if response.status_code in (404, 410):
+            return None
+        if response.ok and 'Content-Length' in response.headers:
+            size = int(response.headers['Content-Length'])
+            if _is_html(response) or size < MIN_SIZE:
+                return None
+            return Source(response.url, size, response.headers.get('Accept-Ranges') == 'bytes')
+
+        # HEAD refused or uninformative: ask for the first kilobyte instead
+        with session.get(url, headers={'Range': 'bytes=0-1023'}, timeout=timeout, stream=True) as response:
+            if response.status_code not in (200, 206) or _is_html(response):
+                return None
+            if response.status_code == 206:
+                match = re.search(r'/(\d+)$', response.headers.get('Content-Range', ''))
+                size = int(match.group(1)) if match else None
+            else:
+                size = int(response.headers['Content-Length']) if 'Content-Length' in response.headers else None
+            if size is not None and size < MIN_SIZE:
+                return None
+            return Source(response.url, size, response.status_code == 206)
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+
+
+def find_source(session: requests.Session, urls: List[str], timeout: float = 30.0) -> Optional[Source]:
+    """Probe all candidate URLs concurrently and return the first, in the given order, that serves the file."""
+    with ThreadPoolExecutor(max_workers=max(1, len(urls))) as executor:
+        sources = list(executor.map(lambda url: probe(session, url, timeout), urls))
+    return next((source for source in sources if source), None)
+
+
+def download_file(session: requests.Session, source: Source, path: str, chunk_size: int = CHUNK_SIZE,
+                  retry_policy: Optional[RetryPolicy] = None, timeout: float = 60.0,
+                  store: Optional[ArtifactStore] = None) -> int:
+    """
+    Stream a file to ``path`` and return its size.
+
+    The body is written to ``<path>.part`` chunk by chunk and renamed into place
+    once complete (through ``store`` when given, so a file identical to one
+    already stored shares its object). Transient failures are retried with backoff; each retry (and a
+    later run after an interruption) continues from the bytes already in the
+    ``.part`` file when the server supports Range requests. A file already at
+    ``path`` with the expected size is kept without any download.
+
+    Raises:
+        requests.exceptions.RequestException: The transfer failed for good
+        IOError: The file on disk doesn't have the size the server announced
+    """
+    if source.size is not None and os.path.exists(path) and os.path.getsize(path) == source.size:
+        return source.size
+    partial = path + '.part'
+    delays = (retry_policy or RetryPolicy()).delays()
+    while True:
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        if source.size is not None and offset >= source.size:
+            break  # the previous attempt got everything
+        headers = {'Range': f'bytes={offset}-'} if offset and source.accepts_ranges else None
+        try:
+            with session.get(source.url, headers=headers, timeout=timeout, stream=True) as response:
+                if response.status_code == 416:
+                    os.remove(partial)  # the .part file doesn't belong to this file any more
+                    continue
+                response.raise_for_status()
+                # A 200 means the server ignored the range: start over
+                with open(partial, 'ab' if response.status_code == 206 else 'wb') as f:
+                    for chunk in response.iter_content(chunk_size):
+                        f.write(chunk)
+            if source.size is None or os.path.getsize(partial) >= source.size:
+                break
+            error = f"connection closed after {os.path.getsize(partial)} of {source.size} bytes"
+        except requests.exceptions.RequestException as e:
+            if not is_retryable(e):
+                raise
+            error = e
+        delay = next(delays, None)
+        if delay is None:
+            if isinstance(error, Exception):
+                raise error
+            break
+        print(f"  Retrying {source.url} in {delay:.1f}s ({error})")
+        time.sleep(delay)
+
+    size = os.path.getsize(partial)
+    if (source.size is not None and size != source.size) or size < MIN_SIZE:
+        raise IOError(f"{source.url}: got {size} bytes, expected {source.size or f'at least {MIN_SIZE}'}")
+    if store:
+        store.commit(partial, path)
+    else:
+        os.replace(partial, path)
+    return size
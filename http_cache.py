@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk cache for Sefaria API responses.
+
+Responses are stored in a single SQLite file keyed by the canonical Sefaria ref
+(e.g. ``Rashi on Berakhot.2a``). Entries younger than the TTL are served without
+touching the network; older entries are revalidated with ``If-None-Match`` /
+``If-Modified-Since`` so an unchanged text costs only a 304. The total body size
+is capped and the least recently used entries are evicted first.
+
+Refs known to have no text (e.g. an amud without Tosafot) are kept in a separate
+negative cache with their own TTL, so repeat syncs can skip them entirely.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import List, NamedTuple, Optional, Union
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'sefaria.sqlite')
+
+
+class CacheEntry(NamedTuple):
+    body: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+    fresh: bool
+
+    def conditional_headers(self) -> dict:
+        """Headers that ask the server to answer 304 if this entry is still current."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = 7 * 24 * 3600, max_bytes: int = 500 * 1024 * 1024,
+                 negative_ttl: float = 30 * 24 * 3600):
+        """
+        Open (or create) the cache.
+
+        Args:
+            path: SQLite database file
+            ttl: Seconds an entry is served without revalidation
+            max_bytes: Total body size kept before least recently used entries are evicted
+            negative_ttl: Seconds a ref recorded as empty is trusted before being fetched again
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' key TEXT PRIMARY KEY, body TEXT NOT NULL, etag TEXT, last_modified TEXT,'
+            ' stored_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS empty_refs (key TEXT PRIMARY KEY, checked_at REAL NOT NULL)')
+        self._conn.commit()
+        self._total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Look up an entry and mark it as recently used."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT body, etag, last_modified, stored_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+        body, etag, last_modified, stored_at = row
+        return CacheEntry(body, etag, last_modified, stored_at, now - stored_at < self.ttl)
+
+    def put(self, key: str, body: Union[str, bytes], etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """
+        Store a response body, evicting old entries if the cache grows past its cap.
+
+        The body may also be given as UTF-8 bytes (e.g. a streamed response read back
+        from disk); it is stored as text all the same, without being decoded in Python.
+        """
+        now = time.time()
+        size = len(body) if isinstance(body, bytes) else len(body.encode('utf-8'))
+        with self._lock:
+            old = self._conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, body, etag, last_modified, stored_at, accessed_at, size)'
+                ' VALUES (?, CAST(? AS TEXT), ?, ?, ?, ?, ?)',
+                (key, body, etag, last_modified, now, now, size),
+            )
+            self._total += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def revalidated(self, key: str):
+        """Restart an entry's TTL after the server confirmed it is unchanged (304)."""
+        with self._lock:
+            self._conn.execute('UPDATE responses SET stored_at = ? WHERE key = ?', (time.time(), key))
+            self._conn.commit()
+
+    def is_known_empty(self, key: str) -> bool:
+        """True if the ref was recorded as empty within the negative TTL."""
+        with self._lock:
+            row = self._conn.execute('SELECT checked_at FROM empty_refs WHERE key = ?', (key,)).fetchone()
+        return row is not None and time.time() - row[0] < self.negative_ttl
+
+    def record_empty(self, key: str, empty: bool = True):
+        """Record whether a ref came back without any text."""
+        with self._lock:
+            if empty:
+                self._conn.execute('INSERT OR REPLACE INTO empty_refs (key, checked_at) VALUES (?, ?)', (key, time.time()))
+            else:
+                self._conn.execute('DELETE FROM empty_refs WHERE key = ?', (key,))
+            self._conn.commit()
+
+    def known_empty(self, prefix: str = '') -> List[str]:
+        """Return the refs currently trusted as empty, optionally only those starting with a prefix."""
+        cutoff = time.time() - self.negative_ttl
+        pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM empty_refs WHERE key LIKE ? ESCAPE '\\' AND checked_at > ? ORDER BY key", (pattern, cutoff)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _evict(self):
+        while self._total > self.max_bytes:
+            row = self._conn.execute('SELECT key, size FROM responses ORDER BY accessed_at LIMIT 1').fetchone()
+            if row is None:
+                break
+            self._conn.execute('DELETE FROM responses WHERE key = ?', (row[0],))
+            self._total -= row[1]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Completion manifest for resumable downloads.
+
+Records every finished (tractate, daf, source) unit together with the file it was
+written to and a SHA-256 of its contents. The manifest is rewritten atomically
+(temp file + ``os.replace``) so a crash can never leave it half-written.
+
+Rewriting it after every daf would make a whole-Shas run quadratic in I/O (the
+file grows to ~11k entries), so ``save_if_due`` writes it at most once every
+``save_interval`` seconds and the downloader forces a ``save`` at the end of each
+pass, including an interrupted one. A crash loses at most the last few seconds
+of records; those files are fetched again (from the response cache) on resume.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+
+MANIFEST_NAME = '.manifest.json'
+
+
+class Manifest:
+    def __init__(self, output_dir: str, save_interval: float = 5.0):
+        """
+        Load the manifest stored in an output directory (an empty one if none exists).
+
+        Args:
+            output_dir: Directory the downloaded files are written to
+            save_interval: Least number of seconds between two writes by ``save_if_due``
+        """
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self.units = {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.units = json.load(f).get('units', {})
+        except FileNotFoundError:
+            pass
+        except (ValueError, OSError) as e:
+            print(f"Ignoring unreadable manifest {self.path}: {e}")
+
+    @staticmethod
+    def key(tractate: str, daf: int, source: str) -> str:
+        return f"{tractate}|{daf}|{source}"
+
+    def get(self, tractate: str, daf: int, source: str) -> Optional[dict]:
+        return self.units.get(self.key(tractate, daf, source))
+
+    def is_complete(self, tractate: str, daf: int, source: str, filename: str) -> bool:
+        """
+        Check that a unit was recorded and its file is still on disk, unchanged.
+
+        Only reads the file; never touches the network or writes anything.
+        """
+        entry = self.get(tractate, daf, source)
+        if not entry or entry.get('file') != os.path.basename(filename):
+            return False
+        try:
+            if os.path.getsize(filename) != entry.get('size'):
+                return False
+            with open(filename, 'rb') as f:
+                return hashlib.sha256(f.read()).hexdigest() == entry.get('sha256')
+        except OSError:
+            return False
+
+    def record(self, tractate: str, daf: int, source: str, filename: str, content: str):
+        """Mark a unit as complete. Call ``save()`` or ``save_if_due()`` to persist."""
+        encoded = content.encode('utf-8')
+        with self._lock:
+            self.units[self.key(tractate, daf, source)] = {
+                'file': os.path.basename(filename),
+                'size': len(encoded),
+                'sha256': hashlib.sha256(encoded).hexdigest(),
+                'completed_at': time.time(),
+            }
+            self._dirty = True
+
+    def save_if_due(self):
+        """Save unsaved records if ``save_interval`` seconds have passed since the last write."""
+        if self._dirty and time.monotonic() - self._saved_at >= self.save_interval:
+            self.save()
+
+    def save(self):
+        """Atomically write the manifest to disk, if anything was recorded since the last write."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps({'version': 1, 'units': self.units}, ensure_ascii=False, indent=1)
+            directory = os.path.dirname(self.path) or '.'
+            fd, tmp_path = tempfile.mkstemp(prefix=MANIFEST_NAME, suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._dirty = False
+            self._saved_at = time.monotonic()
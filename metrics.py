@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+In-process metrics for the downloaders.
+
+``Metrics`` collects labelled counters and latency histograms (request latency per
+source, bytes transferred, retries, cache hits, time spent sleeping in the rate
+limiter or backing off, file writes). A snapshot can be written as JSON or in the
+Prometheus text exposition format, once at the end of a run or periodically with
+``PeriodicDump`` so a long job can be watched (e.g. by node_exporter's textfile
+collector).
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PREFIX = 'dafyomi_'
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    'http_requests_total': 'HTTP requests sent, by source and status code',
+    'http_request_duration_seconds': 'Time waiting on the network per HTTP request',
+    'http_response_bytes_total': 'Response body bytes received',
+    'http_retries_total': 'Requests retried after a transient failure',
+    'http_throttled_total': 'Responses asking us to slow down (429/503)',
+    'rate_limit_wait_seconds_total': 'Time spent blocked in the rate limiter',
+    'retry_backoff_seconds_total': 'Time spent sleeping before retries',
+    'cache_lookups_total': 'Response cache lookups: fresh hit, revalidated (304), stale (refetched) or miss',
+    'negative_cache_skips_total': 'Amudim skipped because the negative cache knows they are empty',
+    'fetch_duration_seconds': 'Wall time of one fetch unit, including cache, retries and rate limiting',
+    'file_writes_total': 'Output files written',
+    'file_write_bytes_total': 'Bytes written to output files',
+    'file_write_skips_total': 'Output files not rewritten because they already held the same bytes',
+    'file_write_duration_seconds': 'Time spent writing one output file',
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls into."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, count) pairs in Prometheus order, ending with +Inf."""
+        pairs, seen = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            pairs.append((repr(float(bound)), seen))
+        pairs.append(('+Inf', self.count))
+        return pairs
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _finite(value: float) -> Optional[float]:
+    """JSON has no Infinity; report an estimate past the last bucket as null."""
+    return None if value == float('inf') else value
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f'{value:.6f}'
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Add to a counter."""
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one observation in a histogram."""
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Observe the wall time of a block in a histogram."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started, **labels)
+
+    def counter(self, name: str, **labels) -> float:
+        """Sum of a counter over every series matching the given labels."""
+        want = set(_labels(labels))
+        with self._lock:
+            return sum(v for k, v in self._counters.get(name, {}).items() if want <= set(k))
+
+    def cache_hit_ratio(self) -> Optional[float]:
+        """Fraction of cache lookups answered without a full download (None if the cache wasn't used)."""
+        total = self.counter('cache_lookups_total')
+        if not total:
+            return None
+        return (self.counter('cache_lookups_total', result='fresh') + self.counter('cache_lookups_total', result='revalidated')) / total
+
+    def snapshot(self) -> dict:
+        """Return every metric as plain data (what ``to_json`` writes)."""
+        with self._lock:
+            counters = {
+                name: [{'labels': dict(k), 'value': v} for k, v in sorted(series.items())]
+                for name, series in sorted(self._counters.items())
+            }
+            histograms = {
+                name: [
+                    {'labels': dict(k), 'count': h.count, 'sum': round(h.sum, 6),
+                     **{f'p{int(q * 100)}': _finite(h.quantile(q)) for q in (0.5, 0.9, 0.99)},
+                     'buckets': dict(h.cumulative())}
+                    for k, h in sorted(series.items())
+                ]
+                for name, series in sorted(self._histograms.items())
+            }
+        return {
+            'started_at': self.started,
+            'uptime_seconds': round(time.time() - self.started, 3),
+            'cache_hit_ratio': self.cache_hit_ratio(),
+            'counters': counters,
+            'histograms': histograms,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full = PREFIX + name
+                lines.append(f'# HELP {full} {HELP.get(name, name)}')
+                lines.append(f'# TYPE {full} counter')
+                for labels, value in sorted(series.items()):
+                    lines.append(f'{full}{_format_labels(labels)} {_format_value(value)}')
+            for name, series in sorted(self._histograms.items()):
+                full = PREFIX + name
+                lines.append(f'# HELP {full} {HELP.get(name, name)}')
+                lines.append(f'# TYPE {full} histogram')
+                for labels, h in sorted(series.items()):
+                    for le, count in h.cumulative():
+                        lines.append(f'{full}_bucket{_format_labels(labels, ("le", le))} {count}')
+                    lines.append(f'{full}_sum{_format_labels(labels)} {h.sum:.6f}')
+                    lines.append(f'{full}_count{_format_labels(labels)} {h.count}')
+        lines.append(f'# TYPE {PREFIX}start_time_seconds gauge')
+        lines.append(f'{PREFIX}start_time_seconds {self.started:.3f}')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path: str):
+        """
+        Atomically write the metrics to a file.
+
+        Files ending in ``.prom`` get the Prometheus text format; anything else gets JSON.
+        """
+        data = self.to_prometheus() if path.endswith('.prom') else self.to_json()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path), suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class PeriodicDump:
+    def __init__(self, metrics: Metrics, paths: List[str], interval: float = 60.0):
+        """
+        Write the metrics to every path in a background thread until stopped.
+
+        Args:
+            metrics: Metrics to dump
+            paths: Output files (``.prom`` for Prometheus text, otherwise JSON)
+            interval: Seconds between dumps
+        """
+        self.metrics = metrics
+        self.paths = paths
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-dump', daemon=True)
+
+    def dump(self):
+        for path in self.paths:
+            try:
+                self.metrics.dump(path)
+            except OSError as e:
+                print(f"Could not write metrics to {path}: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+    def start(self) -> 'PeriodicDump':
+        if self.interval > 0:
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the thread and write one final dump."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.dump()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the Sefaria API, for benchmarks and offline testing.
+
+Serves ``/api/texts/<ref>`` and ``/api/v2/raw/index/<book>`` from the text files
+already in the repo:
+
+- Talmud: ``example_downloads/`` and ``downloads/`` (``--- 2a ---`` sections). Amudim
+  without a fixture get filler text of realistic size, so any tractate works.
+- Psalms: ``tehillim_full.txt``; Malbim on Psalms: ``malvim_on_tehillim.txt``
+- Shemonah Kevatzim: ``shmona_kevatzim_all.txt``
+
+Ranged refs (``Berakhot.2a-3b``, ``Psalms.1-150``) are answered like Sefaria, with
+one nested array per section plus ``isSpanning``/``spanningRefs``. Latency, jitter,
+5xx errors and 429 throttling can be injected. Point the downloader at it with
+``SEFARIA_BASE_URL=http://127.0.0.1:<port>``.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import unquote, urlparse
+
+from daf_yomi_downloader import TRACTATES, parse_amud, section_to_amud
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def amud_to_section(amud: str) -> int:
+    """Inverse of section_to_amud: '2a' -> 3."""
+    daf, side = parse_amud(amud)
+    return daf * 2 - 1 + (side == 'b')
+
+
+def _split_sections(text: str, header: str) -> Dict[int, str]:
+    """Split a '--- <header> N ---' style file into {N: body}."""
+    sections = {}
+    for match in re.finditer(rf'^--- {header} ---\n(.*?)(?=^--- |\Z)', text, re.S | re.M):
+        sections[int(match.group(1))] = match.group(2).strip()
+    return sections
+
+
+class Fixtures:
+    """Texts the mock server answers with, keyed by book title and 1-based section."""
+
+    def __init__(self, root: str = ROOT):
+        self.books: Dict[str, Dict[int, list]] = {}
+        self.talmud = {t["english"]: t for t in TRACTATES}
+        self.filler: Dict[str, list] = {}
+        self._load_talmud(root)
+        self._load_psalms(root)
+        self._load_shmona(root)
+
+    def _load_talmud(self, root: str):
+        suffixes = {"steinsaltz": "Steinsaltz", "rashi": "Rashi", "tosafot": "Tosafot"}
+        paths = glob.glob(os.path.join(root, 'example_downloads', '*.txt')) + glob.glob(os.path.join(root, 'downloads', '*.txt'))
+        for path in paths:
+            match = re.match(r'(.+?)_(\d+)(?:_(steinsaltz|rashi|tosafot))?\.txt$', os.path.basename(path))
+            if not match or match.group(1) not in self.talmud:
+                continue
+            title = match.group(1) if not match.group(3) else f"{suffixes[match.group(3)]} on {match.group(1)}"
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+            for header in re.finditer(r'^--- (\d+[ab]) ---\n(.*?)(?=^--- |\Z)', text, re.S | re.M):
+                body = header.group(2).strip()
+                if body.startswith('[') and body.endswith(']'):
+                    segments = []  # "[No commentary available]" placeholder
+                else:
+                    segments = body.split('\n')
+                self.books.setdefault(title, {})[amud_to_section(header.group(1))] = segments
+                if segments:
+                    self.filler.setdefault(title.split(' on ')[0] if ' on ' in title else 'main', segments)
+
+    def _load_psalms(self, root: str):
+        for filename, title, header in (
+            ('tehillim_full.txt', 'Psalms', r'פרק (\d+)'),
+            ('malvim_on_tehillim.txt', 'Malbim on Psalms', r'פירוש המלבי"ם על פרק (\d+)'),
+        ):
+            try:
+                with open(os.path.join(root, filename), encoding='utf-8') as f:
+                    sections = _split_sections(f.read(), header)
+            except OSError:
+                continue
+            self.books[title] = {n: [s for s in body.split('\n\n') if s.strip()] for n, body in sections.items()}
+
+    def _load_shmona(self, root: str):
+        try:
+            with open(os.path.join(root, 'shmona_kevatzim_all.txt'), encoding='utf-8') as f:
+                text = f.read()
+        except OSError:
+            return
+        book = {}
+        for match in re.finditer(r'^={10,}\nקובץ (\d+)\n={10,}\n(.*?)(?=^={10,}\n|\Z)', text, re.S | re.M):
+            paragraphs = [p.strip() for p in match.group(2).split('\n\n') if p.strip()]
+            book[int(match.group(1))] = [re.sub(r'^פסקה \d+:\n', '', p).split('\n') for p in paragraphs]
+        self.books['Shemonah Kevatzim'] = book
+
+    def section_count(self, title: str) -> Optional[int]:
+        commentary, _, base = title.rpartition(' on ')
+        if base in self.talmud:
+            return amud_to_section(self.talmud[base]["last"])
+        if title in self.books and self.books[title]:
+            return max(self.books[title])
+        return None
+
+    def section_label(self, title: str, section: int) -> str:
+        base = title.rpartition(' on ')[2]
+        return section_to_amud(section) if base in self.talmud else str(section)
+
+    def parse_section(self, title: str, label: str) -> Optional[int]:
+        base = title.rpartition(' on ')[2]
+        try:
+            return amud_to_section(label) if base in self.talmud else int(label)
+        except ValueError:
+            return None
+
+    def text(self, title: str, section: int) -> Optional[list]:
+        """Return the 'he' array of one section (None if the section doesn't exist)."""
+        commentary, _, base = title.rpartition(' on ')
+        if base in self.talmud:
+            first = amud_to_section(self.talmud[base]["first"])
+            if not first <= section <= amud_to_section(self.talmud[base]["last"]):
+                return None
+            if section in self.books.get(title, {}):
+                return self.books[title][section]
+            return list(self.filler.get(commentary or 'main', [f"{title} {section_to_amud(section)}"]))
+        book = self.books.get(title)
+        if book is None or section not in book:
+            return None
+        return book[section]
+
+    def index(self, title: str) -> Optional[dict]:
+        """Return a minimal /api/v2/raw/index document."""
+        count = self.section_count(title)
+        if count is None:
+            return None
+        if title in self.talmud:
+            schema = {"addressTypes": ["Talmud", "Integer"], "sectionNames": ["Daf", "Line"], "lengths": [count]}
+            categories = ["Talmud", "Bavli"]
+        else:
+            total = sum(len(v) for v in self.books[title].values())
+            schema = {"addressTypes": ["Integer", "Integer"], "sectionNames": ["Chapter", "Verse"], "lengths": [count, total]}
+            categories = []
+        return {"title": title, "categories": categories, "schema": schema}
+
+
+class MockSefariaServer:
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, retry_after: float = 1.0,
+                 max_span: Optional[int] = None, fixtures: Optional[Fixtures] = None):
+        """
+        Args:
+            host, port: Address to listen on (port 0 picks a free port)
+            latency: Seconds added to every response
+            jitter: Maximum random seconds added or removed from the latency
+            error_rate: Fraction of requests answered with HTTP 500
+            throttle_rate: Fraction of requests answered with HTTP 429
+            retry_after: Retry-After value sent with 429 responses
+            max_span: Largest ranged request accepted; longer ranges get HTTP 400
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.max_span = max_span
+        self.fixtures = fixtures or Fixtures()
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {"requests": 0, "statuses": {}, "durations": [], "bytes": 0}
+
+    def _record(self, status: int, duration: float, size: int):
+        with self.stats_lock:
+            self.stats["requests"] += 1
+            self.stats["statuses"][status] = self.stats["statuses"].get(status, 0) + 1
+            self.stats["durations"].append(duration)
+            self.stats["bytes"] += size
+
+    def start(self) -> 'MockSefariaServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def respond(self, path: str, headers) -> tuple:
+        """Return (status, extra headers, JSON body) for a request path."""
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            return 429, {"Retry-After": f"{self.retry_after:g}"}, {"error": "Too many requests"}
+        if self.error_rate and random.random() < self.error_rate:
+            return 500, {}, {"error": "Injected server error"}
+
+        path = unquote(urlparse(path).path)
+        if path.startswith('/api/v2/raw/index/'):
+            title = path[len('/api/v2/raw/index/'):].replace('_', ' ')
+            index = self.fixtures.index(title)
+            return (200, {}, index) if index else (404, {}, {"error": f"Index not found: {title}"})
+        if path.startswith('/api/texts/'):
+            return self._texts(path[len('/api/texts/'):])
+        return 404, {}, {"error": f"Unknown endpoint {path}"}
+
+    def _texts(self, ref: str) -> tuple:
+        match = re.match(r'^(?P<title>.+?)(?:[. ](?P<start>\d+[ab]?)(?:-(?P<end>\d+[ab]?))?)?$', ref.replace('_', ' '))
+        if not match:
+            return 200, {}, {"error": f"Invalid reference: {ref}"}
+        title = match.group('title')
+        if self.fixtures.section_count(title) is None:
+            return 200, {}, {"error": f"Could not find title in reference: {ref}"}
+        start = self.fixtures.parse_section(title, match.group('start') or '1')
+        end = self.fixtures.parse_section(title, match.group('end')) if match.group('end') else start
+        if start is None or end is None or end < start:
+            return 200, {}, {"error": f"Invalid reference: {ref}"}
+        if self.max_span and end - start + 1 > self.max_span:
+            return 400, {}, {"error": f"Range too large: {ref}"}
+
+        sections = list(range(start, end + 1))
+        texts = [self.fixtures.text(title, section) for section in sections]
+        if texts[0] is None:
+            return 200, {}, {"error": f"{ref} is not a valid reference"}
+        labels = [self.fixtures.section_label(title, section) for section in sections]
+        if len(sections) == 1:
+            return 200, {}, {"ref": f"{title} {labels[0]}", "sections": [labels[0]], "he": texts[0]}
+        return 200, {}, {
+            "ref": f"{title} {labels[0]}-{labels[-1]}",
+            "isSpanning": True,
+            "spanningRefs": [f"{title} {label}" for label in labels],
+            "he": [text or [] for text in texts],
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                started = time.monotonic()
+                delay = server.latency + random.uniform(-server.jitter, server.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                status, headers, payload = server.respond(self.path, self.headers)
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if status == 200 and self.headers.get('If-None-Match') == etag:
+                    status, body = 304, b''
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if status in (200, 304):
+                    self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                server._record(status, time.monotonic() - started, len(body))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline mock of the Sefaria API')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', '-p', type=int, default=8765, help='Port to listen on (default: 8765)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds added to every response (default: 0.05)')
+    parser.add_argument('--jitter', type=float, default=0.02, help='Random +/- seconds on top of the latency (default: 0.02)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of requests answered with 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After sent with 429 (default: 1)')
+    parser.add_argument('--max-span', type=int, help='Largest ranged request accepted')
+    args = parser.parse_args()
+
+    server = MockSefariaServer(args.host, args.port, args.latency, args.jitter, args.error_rate,
+                               args.throttle_rate, args.retry_after, args.max_span)
+    print(f"Mock Sefaria listening on {server.url}")
+    print(f"Use: SEFARIA_BASE_URL={server.url} python daf_yomi_downloader.py ...")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+PDF helpers for the daat.ac.il editions of Shemonah Kevatzim.
+
+``merge_pdfs`` joins the downloaded kevatzim into one volume with an outline
+entry per kovetz. Inputs are read from disk through open file handles, one at a
+time and only as far as pypdf needs them, instead of being loaded into memory;
+the merged file is written to a temporary file and moved into place through the
+artifact store. The SHA-256 of every input is recorded next to the output, and a
+merge whose inputs (and output) haven't changed since the last one is skipped.
+
+``extract_text`` turns the kevatzim into plain text for the rest of the tooling.
+Every PDF is split into page ranges that a process pool extracts in parallel;
+each page's text runs are put back into reading order from their positions
+(the PDFs draw Hebrew in visual order, which pypdf's own extraction mangles into
+reversed words). The output follows the layout of ``shmona_kevatzim_all.txt``,
+with "עמוד N:" before each page, and a JSON index next to it gives the
+character offset of every page.
+
+Needs ``pypdf`` (or the older ``PyPDF2``)::
+
+    pip install pypdf
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from typing import Dict, List, Optional, Tuple
+
+from artifact_store import ArtifactStore, file_hash
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    try:
+        from PyPDF2 import PdfReader, PdfWriter
+    except ImportError:
+        PdfReader = PdfWriter = None
+
+SEPARATOR = '=' * 60
+
+# Pages extracted per task; small enough to keep every worker busy on a single PDF
+PAGES_PER_TASK = 24
+
+# Text runs whose baselines are this close (in points) are on the same line
+LINE_TOLERANCE = 2.0
+
+
+def _state_path(output_path: str) -> str:
+    directory, name = os.path.split(os.path.abspath(output_path))
+    return os.path.join(directory, f'.{name}.inputs.json')
+
+
+def _load_state(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _input_state(inputs: List[Tuple[str, str]]) -> dict:
+    return {'inputs': [[title, os.path.basename(path), file_hash(path)] for title, path in inputs]}
+
+
+def _unchanged(state: dict, output_path: str) -> bool:
+    """Whether ``output_path`` was last built from exactly these inputs and hasn't been touched since."""
+    previous = _load_state(_state_path(output_path))
+    return bool(previous and previous.get('inputs') == state['inputs'] and os.path.exists(output_path)
+                and previous.get('output') == file_hash(output_path))
+
+
+def _save_state(state: dict, output_path: str):
+    state = dict(state, output=file_hash(output_path))
+    with open(_state_path(output_path), 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+
+
+def merge_pdfs(inputs: List[Tuple[str, str]], output_path: str, store: Optional[ArtifactStore] = None) -> bool:
+    """
+    Merge PDFs, in order, into ``output_path``.
+
+    Args:
+        inputs: (outline title, path) for every input file
+        output_path: Merged PDF
+        store: Artifact store the merged file is committed through (None to write it directly)
+
+    Returns:
+        False if the merge was skipped because nothing changed since the last one
+
+    Raises:
+        ImportError: Neither pypdf nor PyPDF2 is installed
+    """
+    if PdfWriter is None:
+        raise ImportError("merging PDFs needs pypdf (pip install pypdf)")
+    state = _input_state(inputs)
+    if _unchanged(state, output_path):
+        return False
+
+    tmp_path = output_path + '.tmp'
+    writer = PdfWriter()
+    # PyPDF2 resolves page content from the readers only when writing, so every input stays open until then
+    with ExitStack() as stack:
+        for title, path in inputs:
+            reader = PdfReader(stack.enter_context(open(path, 'rb')))
+            first_page = len(writer.pages)
+            for page in reader.pages:
+                writer.add_page(page)
+            if hasattr(writer, 'add_outline_item'):
+                writer.add_outline_item(title, first_page)
+        try:
+            with open(tmp_path, 'wb') as f:
+                writer.write(f)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    (store or ArtifactStore(None)).commit(tmp_path, output_path)
+    _save_state(state, output_path)
+    return True
+
+
+def page_text(page) -> str:
+    """
+    Text of one page in reading order.
+
+    Text runs are grouped into lines by baseline, lines are read top to bottom
+    and the runs of each line right to left, which restores the logical order
+    of Hebrew (digits and other left-to-right runs keep their own order).
+    """
+    runs = []
+
+    def visit(text, cm, tm, font_dict, font_size):
+        text = text.replace('\n', '')
+        if text:
+            # Run origin in page space: the text matrix translation mapped through the CTM
+            x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+            y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+            runs.append((x, y, text))
+
+    page.extract_text(visitor_text=visit)
+    lines: Dict[float, List[Tuple[float, str]]] = {}
+    for x, y, text in runs:
+        baseline = next((b for b in lines if abs(b - y) < LINE_TOLERANCE), y)
+        lines.setdefault(baseline, []).append((x, text))
+    return '\n'.join(
+        ''.join(text for _, text in sorted(lines[baseline], key=lambda run: -run[0])).strip()
+        for baseline in sorted(lines, reverse=True)
+    ).strip('\n')
+
+
+def _extract_range(path: str, start: int, stop: int) -> List[str]:
+    """Worker: text of pages ``start``..``stop - 1`` of one PDF."""
+    with open(path, 'rb') as f:
+        reader = PdfReader(f)
+        return [page_text(reader.pages[i]) for i in range(start, stop)]
+
+
+def extract_text(inputs: List[Tuple[str, str]], output_path: str, workers: Optional[int] = None,
+                 store: Optional[ArtifactStore] = None) -> bool:
+    """
+    Extract the text of PDFs into one file, a section per PDF and a numbered block per page.
+
+    The page offsets (in characters) are written to ``<output>.offsets.json``.
+
+    Args:
+        inputs: (section title, path) for every PDF
+        output_path: Text file to write
+        workers: Extraction processes (default: one per CPU)
+        store: Artifact store the output is committed through (None to write it directly)
+
+    Returns:
+        False if the extraction was skipped because nothing changed since the last one
+
+    Raises:
+        ImportError: Neither pypdf nor PyPDF2 is installed
+    """
+    if PdfReader is None:
+        raise ImportError("extracting PDF text needs pypdf (pip install pypdf)")
+    state = _input_state(inputs)
+    if _unchanged(state, output_path):
+        return False
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        sections = []
+        for title, path in inputs:
+            with open(path, 'rb') as f:
+                count = len(PdfReader(f).pages)
+            futures = [executor.submit(_extract_range, path, start, min(start + PAGES_PER_TASK, count))
+                       for start in range(0, count, PAGES_PER_TASK)]
+            sections.append((title, path, futures))
+
+        parts, offsets, position = [], [], 0
+        for title, path, futures in sections:
+            header = ('' if not parts else '\n\n\n') + f"{SEPARATOR}\n{title}\n{SEPARATOR}\n\n"
+            parts.append(header)
+            position += len(header)
+            pages = [text for future in futures for text in future.result()]
+            for number, text in enumerate(pages, 1):
+                block = ('' if number == 1 else '\n\n') + f"עמוד {number}:\n"
+                offsets.append({'section': title, 'file': os.path.basename(path), 'page': number,
+                                'offset': position + len(block), 'length': len(text)})
+                parts.append(block + text)
+                position += len(block) + len(text)
+
+    store = store or ArtifactStore(None)
+    store.write_text(output_path, ''.join(parts))
+    store.write_text(output_path + '.offsets.json', json.dumps(offsets, ensure_ascii=False, indent=1))
+    _save_state(state, output_path)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract the text of PDFs (Hebrew, right to left) into one text file')
+    parser.add_argument('pdfs', nargs='+', help='PDF files, in order')
+    parser.add_argument('--output', '-o', required=True, help='Text file to write (page offsets go to OUTPUT.offsets.json)')
+    parser.add_argument('--workers', '-w', type=int, help='Extraction processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    inputs = [(os.path.splitext(os.path.basename(path))[0], path) for path in args.pdfs]
+    if not extract_text(inputs, args.output, args.workers):
+        print(f"{args.output} is up to date")
+
+
+if __name__ == "__main__":
+    main()
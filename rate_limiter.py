@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Shared token-bucket rate limiter with adaptive backoff.
+
+Every worker thread calls ``acquire()`` before issuing a request. Tokens refill at
+``rate`` per second up to ``burst``. When the server answers 429/503 the limiter
+pauses all workers (honoring ``Retry-After``) and halves its rate, then climbs back
+to the configured rate additively as requests succeed (AIMD).
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# Status codes that mean "slow down" rather than "this request is broken"
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class RateLimiter:
+    def __init__(self, rate: float = 2.0, burst: int = 4, min_rate: float = 0.1):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate: Target requests per second (0 or less disables limiting)
+            burst: Maximum number of requests that may be issued back-to-back
+            min_rate: Floor the adaptive rate never drops below
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.min_rate = min(min_rate, rate) if rate > 0 else min_rate
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.total_wait = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        if self.max_rate <= 0:
+            wait = self._paused_until - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+                self.total_wait += wait
+            time.sleep(wait)
+
+    def on_success(self):
+        """Additively recover toward the configured rate after a successful request."""
+        if self.max_rate <= 0:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """
+        Back off after the server asked us to slow down.
+
+        Args:
+            retry_after: Seconds the server asked us to wait, if it said
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.max_rate > 0:
+                self.rate = max(self.min_rate, self.rate / 2)
+            pause = retry_after if retry_after is not None else 1.0 / max(self.rate, self.min_rate)
+            self._paused_until = max(self._paused_until, now + pause)
+            self._tokens = 0.0
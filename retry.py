@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Retry policy and per-source circuit breaker.
+
+``RetryPolicy`` yields capped exponential backoff delays with full jitter.
+``CircuitBreaker`` stops requests to a source after repeated failures and lets a
+single probe through once its reset timeout has passed (half-open).
+"""
+
+import random
+import threading
+import time
+from typing import Iterator
+
+import requests
+
+# Server errors worth retrying; a 429/503 also pauses the rate limiter before the retry
+RETRYABLE_STATUSES = (500, 502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while a source's breaker is open."""
+
+    def __init__(self, source: str, retry_in: float):
+        super().__init__(f"circuit open for {source}, retry in {retry_in:.0f}s")
+        self.source = source
+        self.retry_in = retry_in
+
+
+def is_retryable(error: Exception) -> bool:
+    """Transient network failures, truncated bodies and 5xx responses are retried; other HTTP errors are not."""
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is not None and error.response.status_code in RETRYABLE_STATUSES
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                              requests.exceptions.ChunkedEncodingError))
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 30.0):
+        """
+        Args:
+            max_attempts: Total attempts per request, including the first
+            base_delay: Backoff before the first retry (seconds)
+            max_delay: Cap on any single backoff (seconds)
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delays(self) -> Iterator[float]:
+        """Yield the sleep before each retry: uniform in [0, min(cap, base * 2**n)]."""
+        for attempt in range(self.max_attempts - 1):
+            yield random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    def __init__(self, source: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        """
+        Args:
+            source: Name used in log messages and errors
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before allowing a probe
+        """
+        self.source = source
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def retry_in(self) -> float:
+        """Seconds until the breaker lets a probe request through (0 if closed)."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def before_request(self):
+        """Raise CircuitOpenError unless a request may be sent now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining <= 0 and not self._probing:
+                self._probing = True  # half-open: let exactly one request test the source
+                return
+            raise CircuitOpenError(self.source, max(0.0, remaining))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release_probe(self):
+        """End a half-open probe that failed for reasons other than the source, so that another can be sent."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    print(f"  Circuit opened for {self.source} after {self._failures} failures")
+                self._opened_at = time.monotonic()
+                self._probing = False
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+Shared client for the Sefaria API.
+
+Every downloader talks to Sefaria through ``SefariaClient``: one pooled
+``requests.Session`` (keep-alive, consistent timeouts), the shared token-bucket
+rate limiter, the on-disk response cache, jittered retries with a per-source
+circuit breaker, and metrics. ``flatten_text`` and ``iter_paragraphs`` turn
+Sefaria's nested ``he`` arrays into plain text the same way everywhere.
+"""
+
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
+
+import requests
+
+try:
+    import ijson
+except ImportError:  # optional: without it, large responses are parsed in one piece
+    ijson = None
+
+from http_cache import DEFAULT_CACHE_PATH, ResponseCache
+from metrics import Metrics
+from rate_limiter import RateLimiter, THROTTLE_STATUSES, parse_retry_after
+from retry import CircuitBreaker, CircuitOpenError, RetryPolicy, is_retryable
+
+DEFAULT_BASE_URL = 'https://www.sefaria.org'
+
+# Point every downloader at another server (e.g. mock_sefaria.py) without code changes
+SEFARIA_BASE_URL = os.environ.get('SEFARIA_BASE_URL', DEFAULT_BASE_URL)
+
+USER_AGENT = 'Daf Yomi Downloader (respectful automated access)'
+
+# What a failed fetch can raise: network/HTTP errors, an open circuit breaker, or a body that isn't JSON
+FETCH_ERRORS = (requests.exceptions.RequestException, CircuitOpenError, ValueError)
+
+
+class SefariaError(ValueError):
+    """An error Sefaria reported in the body of a response (``{"error": ...}`` with HTTP 200)."""
+
+
+# Streamed responses up to this size are also stored in the response cache; larger ones never are
+MAX_STREAM_CACHE_BYTES = 32 * 1024 * 1024
+
+# Streamed bodies are copied to a temporary file for the cache, in memory up to this size
+STREAM_SPOOL_BYTES = 1024 * 1024
+
+
+def flatten_text(he, separator: str = '\n') -> str:
+    """Flatten Sefaria's (possibly nested) ``he`` field into text, one segment per separator."""
+    if isinstance(he, list):
+        return separator.join(part for part in (flatten_text(item, separator) for item in he) if part)
+    return str(he) if he else ""
+
+
+def paragraph_text(section) -> str:
+    """Join the segments of one section of ``he``, stripped, one per line."""
+    segments = section if isinstance(section, list) else [section]
+    return '\n'.join(str(seg).strip() for seg in segments if seg and str(seg).strip())
+
+
+def iter_paragraphs(he) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (number, text) for each top-level section of ``he`` that has any text.
+
+    ``he`` may also be an iterator of (number, section) pairs, such as
+    ``SefariaClient.stream_sections`` yields. Numbering is 1-based and keeps
+    counting over empty sections, matching Sefaria's own section numbers.
+    """
+    if isinstance(he, list):
+        he = enumerate(he, 1)
+    elif not isinstance(he, Iterator):
+        he = enumerate([he], 1)
+    for number, section in he:
+        text = paragraph_text(section)
+        if text:
+            yield number, text
+
+
+class _CountingReader:
+    """File-like view of a streamed body that counts the bytes read and can copy them to a file."""
+
+    def __init__(self, raw, copy=None):
+        self.raw = raw
+        self.copy = copy
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.raw.read(size)
+        self.size += len(chunk)
+        if self.copy is not None:
+            self.copy.write(chunk)
+        return chunk
+
+
+def _sections(data: dict, ref: str) -> Iterator[Tuple[int, object]]:
+    """(number, section) for each element of a response's ``he``; a string ``he`` is section 1."""
+    if isinstance(data, dict) and 'error' in data:
+        raise SefariaError(f"{ref}: {data['error']}")
+    he = data.get('he', [])
+    return enumerate(he if isinstance(he, list) else [he], 1)
+
+
+def _stream_he(events, ref: str) -> Iterator[object]:
+    """
+    Each element of ``he`` (or ``he`` itself when it is a string) as ijson's events for
+    a response go by, building one element at a time.
+
+    Raises:
+        SefariaError: The response has a top-level ``error`` key (checked once the body is parsed)
+    """
+    builder = None
+    error = None
+    for prefix, event, value in events:
+        if prefix == 'he.item' or prefix.startswith('he.item.'):
+            if builder is None:
+                builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+            # An element ends with its own scalar or closing event, not with a nested one's
+            if prefix == 'he.item' and event not in ('start_map', 'start_array', 'map_key'):
+                yield builder.value
+                builder = None
+        elif prefix == 'he' and event in ('string', 'number'):
+            yield value
+        elif prefix == '' and event == 'map_key' and value == 'error':
+            error = 'error'
+        elif prefix == 'error' and event == 'string':
+            error = value  # the message, when it is a plain string
+    if error is not None:
+        raise SefariaError(f"{ref}: {error}")
+
+
+def split_sections(data: dict, start: int, end: int) -> Optional[Dict[int, object]]:
+    """
+    Split the ``he`` field of a response for sections ``start``-``end`` (e.g. ``Psalms.1-150``)
+    into one entry per section number.
+
+    Returns None when the response is an error or doesn't line up with the range.
+    """
+    if not isinstance(data, dict) or 'error' in data:
+        return None
+    he = data.get('he', [])
+    if start == end:
+        return {start: he}
+    if not data.get('isSpanning') or not isinstance(he, list):
+        return None
+    spanning_refs = data.get('spanningRefs') or []
+    if len(spanning_refs) == len(he):
+        parts = {}
+        for ref, section in zip(spanning_refs, he):
+            match = re.search(r'(\d+)(?::\d+(?:-\d+)?)?$', ref)
+            if not match:
+                return None
+            parts[int(match.group(1))] = section
+        if not set(parts) <= set(range(start, end + 1)):
+            return None
+        # Sections missing from the span have no text
+        return {number: parts.get(number, []) for number in range(start, end + 1)}
+    if len(he) == end - start + 1:
+        return dict(zip(range(start, end + 1), he))
+    return None
+
+
+class SefariaClient:
+    def __init__(
+        self,
+        base_url: str = SEFARIA_BASE_URL,
+        rate: float = 2.0,
+        burst: int = 4,
+        concurrency: int = 4,
+        cache: Optional[ResponseCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        metrics: Optional[Metrics] = None,
+        timeout: float = 30.0,
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            base_url: Sefaria server to talk to
+            rate: Requests per second shared by every thread using this client
+            burst: Number of requests that may be sent back-to-back before the rate applies
+            concurrency: Connections kept alive in the pool (one per worker thread)
+            cache: Persistent response cache (None to always hit the network)
+            retry_policy: Backoff used when a request fails transiently
+            metrics: Where request and cache metrics are recorded
+            timeout: Seconds to wait for the server on each request
+        """
+        self.base_url = base_url.rstrip('/')
+        self.rate_limiter = RateLimiter(rate=rate, burst=burst)
+        self.cache = cache
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.metrics = metrics or Metrics()
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self.breakers = {}
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        # Size the connection pool so every worker thread can reuse a kept-alive connection
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def cache_key(self, ref: str) -> str:
+        """Cache key of a ref; responses from a non-default server never mix with sefaria.org's."""
+        return ref if self.base_url == DEFAULT_BASE_URL else f"{self.base_url} {ref}"
+
+    def texts_url(self, ref: str, base_text: bool = True) -> str:
+        """URL of the texts API for a ref; base texts are requested without attached commentary."""
+        if base_text:
+            return f"{self.base_url}/api/texts/{ref}?lang=he&commentary=0&context=0"
+        return f"{self.base_url}/api/texts/{ref}?lang=he&context=0"
+
+    def get(self, url: str, headers: Optional[dict] = None, source: str = "main",
+            stream: bool = False) -> requests.Response:
+        """
+        Send one GET through the shared rate limiter.
+
+        A throttled response (429/503) pauses the rate limiter for every thread (for
+        the server's ``Retry-After`` if it sent one) and is returned as is; whether to
+        send the request again is up to ``_request``'s retry policy. With ``stream``
+        the body is left unread on the socket for the caller to consume (and to count
+        in ``http_response_bytes_total``).
+        """
+        started = time.monotonic()
+        self.rate_limiter.acquire()
+        sent = time.monotonic()
+        self.metrics.inc('rate_limit_wait_seconds_total', sent - started, source=source)
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=stream)
+        except requests.exceptions.RequestException as e:
+            self.metrics.inc('http_requests_total', source=source, status=type(e).__name__)
+            raise
+        self.metrics.observe('http_request_duration_seconds', time.monotonic() - sent, source=source)
+        self.metrics.inc('http_requests_total', source=source, status=response.status_code)
+        if not stream:
+            self.metrics.inc('http_response_bytes_total', len(response.content), source=source)
+        with self._lock:
+            self.request_count += 1
+        if response.status_code not in THROTTLE_STATUSES:
+            self.rate_limiter.on_success()
+            return response
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        self.metrics.inc('http_throttled_total', source=source)
+        response.close()
+        print(f"  Throttled ({response.status_code}), backing off{f' {retry_after:.0f}s' if retry_after else ''}...")
+        self.rate_limiter.on_throttle(retry_after)
+        return response
+
+    def breaker(self, source: str) -> CircuitBreaker:
+        with self._lock:
+            if source not in self.breakers:
+                self.breakers[source] = CircuitBreaker(source)
+            return self.breakers[source]
+
+    def _request(self, ref: str, url: str, source: str, headers: Optional[dict] = None,
+                 stream: bool = False) -> requests.Response:
+        """
+        GET a URL, retrying transient failures with jittered exponential backoff.
+
+        The retry policy's ``max_attempts`` caps every request sent for it, throttled
+        ones included; after a 429/503 the rate limiter's pause (see ``get``) takes the
+        place of the backoff. The source's circuit breaker is consulted before anything
+        is sent. Returns a successful (2xx or 304) response.
+        """
+        breaker = self.breaker(source)
+        breaker.before_request()
+        delays = self.retry_policy.delays()
+        try:
+            while True:
+                try:
+                    response = self.get(url, headers=headers, source=source, stream=stream)
+                    if response.status_code != 304:
+                        response.raise_for_status()
+                    break
+                except requests.exceptions.RequestException as e:
+                    throttled = getattr(e.response, 'status_code', None) in THROTTLE_STATUSES
+                    delay = next(delays, None) if throttled or is_retryable(e) else None
+                    if delay is None:
+                        breaker.record_failure()
+                        raise
+                    self.metrics.inc('http_retries_total', source=source)
+                    if throttled:
+                        print(f"  Retrying {ref} once the rate limiter's pause is over")
+                        continue
+                    print(f"  Retrying {ref} in {delay:.1f}s ({e})")
+                    self.metrics.inc('retry_backoff_seconds_total', delay, source=source)
+                    time.sleep(delay)
+        except BaseException:
+            # Anything else (a bug, KeyboardInterrupt) says nothing about the source, but
+            # a half-open probe must not stay claimed forever
+            breaker.release_probe()
+            raise
+        breaker.record_success()
+        return response
+
+    def get_json(self, ref: str, url: str, source: str = "main") -> dict:
+        """
+        Fetch a Sefaria API response, serving it from the cache when possible.
+
+        Fresh cache entries cost no request; stale ones are revalidated with a
+        conditional GET and reused on 304. Transient failures are retried (see
+        ``_request``).
+
+        Raises:
+            CircuitOpenError: The source's breaker is open
+            requests.exceptions.RequestException: The request failed for good
+        """
+        key = self.cache_key(ref)
+        entry = self.cache.get(key) if self.cache else None
+        if entry and entry.fresh:
+            self.metrics.inc('cache_lookups_total', result='fresh', source=source)
+            return json.loads(entry.body)
+
+        response = self._request(ref, url, source, headers=entry.conditional_headers() if entry else None)
+        if entry and response.status_code == 304:
+            self.metrics.inc('cache_lookups_total', result='revalidated', source=source)
+            self.cache.revalidated(key)
+            return json.loads(entry.body)
+        data = response.json()
+        if self.cache:
+            self.metrics.inc('cache_lookups_total', result='stale' if entry else 'miss', source=source)
+            if not (isinstance(data, dict) and 'error' in data):
+                self.cache.put(key, response.text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return data
+
+    def texts(self, ref: str, source: str = "main", base_text: bool = True) -> dict:
+        """Fetch ``/api/texts/<ref>`` in Hebrew (see ``get_json`` for caching and retries)."""
+        return self.get_json(ref, self.texts_url(ref, base_text), source)
+
+    def store_sections(self, sections: Dict[str, object]):
+        """
+        Cache the pieces of a split ranged response under their own refs.
+
+        ``Berakhot.2a-2b`` is stored under its ranged ref only; this also stores
+        ``{"ref": ..., "he": ...}`` for ``Berakhot.2a`` and ``Berakhot.2b``, so a later
+        request for a single amud (or chapter) is answered from the cache too. Refs
+        that already have a fresh entry are left alone.
+
+        Args:
+            sections: Mapping of each piece's ref to its ``he`` field
+        """
+        if not self.cache:
+            return
+        for ref, he in sections.items():
+            key = self.cache_key(ref)
+            entry = self.cache.get(key)
+            if entry and entry.fresh:
+                continue
+            self.cache.put(key, json.dumps({'ref': ref, 'he': he}, ensure_ascii=False))
+
+    def stream_sections(self, ref: str, source: str = "main", base_text: bool = True) -> Iterator[Tuple[int, object]]:
+        """
+        Yield (number, section) for each top-level element of a ref's ``he`` field.
+
+        With ``ijson`` installed the response is parsed incrementally straight off
+        the socket, so memory stays flat however large the response is. It goes
+        through the response cache like ``texts()``: a fresh entry is used as is, a
+        stale one is revalidated with a conditional GET, and a body streamed in full
+        is stored once the last section has been yielded (it is copied to a
+        temporary file meanwhile), unless it is larger than ``MAX_STREAM_CACHE_BYTES``.
+        Without ``ijson`` this falls back to ``texts()``.
+
+        Raises:
+            The same errors as ``texts()``, and ``SefariaError`` if Sefaria answered
+            with an error body (after the stream was read to its end); with ``ijson``
+            also ``ijson.JSONError`` if the stream is cut off after some sections were
+            yielded.
+        """
+        key = self.cache_key(ref)
+        entry = self.cache.get(key) if self.cache and ijson else None
+        if ijson is None or (entry and entry.fresh):
+            yield from _sections(self.texts(ref, source, base_text), ref)
+            return
+
+        response = self._request(ref, self.texts_url(ref, base_text), source,
+                                 headers=entry.conditional_headers() if entry else None, stream=True)
+        if entry and response.status_code == 304:
+            response.close()
+            self.metrics.inc('cache_lookups_total', result='revalidated', source=source)
+            self.cache.revalidated(key)
+            yield from _sections(json.loads(entry.body), ref)
+            return
+
+        copy = tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_BYTES) if self.cache else None
+        reader = _CountingReader(response.raw, copy)
+        try:
+            with response:
+                response.raw.decode_content = True
+                # One pass over the body yields the sections and notices an error body
+                yield from enumerate(_stream_he(ijson.parse(reader), ref), 1)
+                while reader.read(STREAM_SPOOL_BYTES):
+                    pass  # whitespace after the document belongs in the cached copy too
+            if copy is not None:
+                self.metrics.inc('cache_lookups_total', result='stale' if entry else 'miss', source=source)
+                if reader.size <= MAX_STREAM_CACHE_BYTES:
+                    copy.seek(0)
+                    self.cache.put(key, copy.read(), response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        finally:
+            self.metrics.inc('http_response_bytes_total', reader.size, source=source)
+            if copy is not None:
+                copy.close()
+
+    def stream_paragraphs(self, ref: str, source: str = "main") -> Iterator[Tuple[int, str]]:
+        """Yield (number, text) for each non-empty paragraph of a ref as it is parsed (see ``stream_sections``)."""
+        return iter_paragraphs(self.stream_sections(ref, source))
+
+    def index(self, title: str) -> dict:
+        """Fetch a book's ``/api/v2/raw/index`` record (schema, lengths, categories)."""
+        return self.get_json(f"index:{title}", f"{self.base_url}/api/v2/raw/index/{title}", "index")
+
+    def section_count(self, title: str) -> Optional[int]:
+        """Number of top-level sections (chapters, kevatzim...) of a book, from its index."""
+        try:
+            lengths = self.index(title).get('schema', {}).get('lengths') or []
+        except FETCH_ERRORS as e:
+            print(f"  Could not fetch index for {title}: {e}")
+            return None
+        return lengths[0] if lengths else None
+
+    def fetch_sections(self, title: str, count: int, span: Optional[int] = None,
+                       source: str = "main") -> Dict[int, Optional[object]]:
+        """
+        Fetch sections 1..count of a book with as few requests as possible.
+
+        Sections are requested as ranges of up to ``span`` sections (default: the
+        whole book in one request, e.g. ``Psalms.1-150``) and split back locally.
+        Only when the server refuses a range are its sections fetched one by one,
+        in parallel.
+
+        Returns:
+            Mapping of section number to its ``he`` field (None if it couldn't be fetched)
+        """
+        span = max(1, span or count)
+        results = {}
+        refused = []
+        for start in range(1, count + 1, span):
+            end = min(count, start + span - 1)
+            ref = f"{title}.{start}" if start == end else f"{title}.{start}-{end}"
+            try:
+                parts = split_sections(self.texts(ref, source), start, end)
+            except FETCH_ERRORS as e:
+                print(f"  {ref} failed ({e})")
+                parts = None
+            if parts is None:
+                refused.extend(range(start, end + 1))
+            else:
+                results.update(parts)
+                if start != end:
+                    self.store_sections({f"{title}.{number}": he for number, he in parts.items()})
+
+        if refused and span > 1:
+            print(f"  {title}: range refused, fetching {len(refused)} sections one by one")
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                results.update(zip(refused, executor.map(lambda number: self._fetch_section(title, number, source), refused)))
+        return {number: results.get(number) for number in range(1, count + 1)}
+
+    def _fetch_section(self, title: str, number: int, source: str) -> Optional[object]:
+        ref = f"{title}.{number}"
+        try:
+            parts = split_sections(self.texts(ref, source), number, number)
+        except FETCH_ERRORS as e:
+            print(f"  {ref} failed ({e})")
+            return None
+        return parts[number] if parts else None
+
+    def is_known_empty(self, ref: str) -> bool:
+        """True if the negative cache records the ref as having no text."""
+        return bool(self.cache) and self.cache.is_known_empty(self.cache_key(ref))
+
+    def record_empty(self, ref: str, empty: bool = True):
+        if self.cache:
+            self.cache.record_empty(self.cache_key(ref), empty)
+
+    def close(self):
+        self.session.close()
+        if self.cache:
+            self.cache.close()
+
+
+def default_client(**kwargs) -> SefariaClient:
+    """
+    Client for the standalone download scripts.
+
+    Uses the shared response cache unless ``SEFARIA_CACHE`` names another file
+    (or is set to an empty string to disable caching).
+    """
+    cache_path = os.environ.get('SEFARIA_CACHE', DEFAULT_CACHE_PATH)
+    kwargs.setdefault('cache', ResponseCache(cache_path) if cache_path else None)
+    return SefariaClient(**kwargs)
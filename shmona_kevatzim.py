@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Shemonah Kevatzim download pipeline.
+
+Reads the book's structure from Sefaria's index, streams every kovetz concurrently
+into its own checkpoint file (one JSON line per paragraph, flushed as it arrives)
+and merges the finished kevatzim, in order, into ``shmona_kevatzim_all.txt`` while
+the rest are still downloading. An interrupted run picks each kovetz up after the
+last paragraph it checkpointed. The ``download_*shmona*`` scripts are thin
+wrappers around ``download_shmona_kevatzim``.
+"""
+
+import argparse
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, TextIO, Tuple
+
+from artifact_store import ArtifactStore, default_store
+from sefaria_client import FETCH_ERRORS, SefariaClient, default_client
+
+BOOK = 'Shemonah_Kevatzim'
+DEFAULT_KEVATZIM = 8
+OUTPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shmona_kevatzim_all.txt')
+SEPARATOR = '=' * 60
+
+
+class KovetzCheckpoint:
+    def __init__(self, directory: str, number: int):
+        """
+        Checkpoint file of one kovetz: ``kovetz_N.jsonl.part`` while downloading,
+        renamed to ``kovetz_N.jsonl`` once the whole kovetz is on disk.
+        """
+        self.number = number
+        self.path = os.path.join(directory, f'kovetz_{number}.jsonl')
+        self.partial_path = self.path + '.part'
+
+    @property
+    def complete(self) -> bool:
+        return os.path.exists(self.path)
+
+    def resume(self) -> int:
+        """Drop a half-written trailing line and return the last paragraph number checkpointed (0 if none)."""
+        last, good = 0, 0
+        try:
+            with open(self.partial_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        last = json.loads(line)['n']
+                    except (ValueError, KeyError):
+                        break
+                    good += len(line)
+        except FileNotFoundError:
+            return 0
+        with open(self.partial_path, 'r+b') as f:
+            f.truncate(good)
+        return last
+
+    def paragraphs(self) -> Iterator[Tuple[int, str]]:
+        """Yield (number, text) for every paragraph of a complete kovetz."""
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                yield entry['n'], entry['text']
+
+
+def fetch_kovetz(client: SefariaClient, checkpoint: KovetzCheckpoint):
+    """Stream one kovetz into its checkpoint file, skipping paragraphs a previous run already saved."""
+    if checkpoint.complete:
+        print(f"  קובץ {checkpoint.number}: כבר הורד")
+        return
+    done = checkpoint.resume()
+    if done:
+        print(f"  קובץ {checkpoint.number}: ממשיך אחרי פסקה {done}")
+    else:
+        print(f"מוריד קובץ {checkpoint.number}...")
+    with open(checkpoint.partial_path, 'a', encoding='utf-8') as f:
+        for number, text in client.stream_paragraphs(f'{BOOK}.{checkpoint.number}'):
+            if number <= done:
+                continue
+            f.write(json.dumps({'n': number, 'text': text}, ensure_ascii=False) + '\n')
+            f.flush()
+        os.fsync(f.fileno())
+    os.replace(checkpoint.partial_path, checkpoint.path)
+
+
+def write_kovetz(out: TextIO, checkpoint: KovetzCheckpoint, numbered: bool, first: bool) -> Tuple[int, int]:
+    """
+    Append one finished kovetz to the merged output.
+
+    Returns:
+        (paragraphs, characters) written; nothing is written for an empty kovetz
+    """
+    paragraphs = chars = 0
+    for number, text in checkpoint.paragraphs():
+        if paragraphs == 0:
+            header = ('' if first else '\n\n\n') + f"{SEPARATOR}\nקובץ {checkpoint.number}\n{SEPARATOR}\n\n"
+            out.write(header)
+            chars += len(header)
+        else:
+            out.write('\n\n')
+            chars += 2
+        paragraph = f"פסקה {number}:\n{text}" if numbered else text
+        out.write(paragraph)
+        chars += len(paragraph)
+        paragraphs += 1
+    return paragraphs, chars
+
+
+def print_structure(client: Optional[SefariaClient] = None):
+    """Print the book's index record as Sefaria has it (and check the alternative spellings)."""
+    client = client or default_client(timeout=10)
+    print("בודק זמינות ב-Sefaria API...")
+    for title in (BOOK, 'Shemonah Kevatzim', 'Shmonah_Kevatzim', 'Shmonah Kevatzim'):
+        try:
+            data = client.index(title)
+        except FETCH_ERRORS as e:
+            print(f"לא נמצא: {title} ({e})")
+            continue
+        print(f"נמצא: {title}")
+        print(json.dumps(data, indent=2, ensure_ascii=False)[:1000])
+
+
+def download_shmona_kevatzim(numbered: bool = False, workers: int = 4, output_path: str = OUTPUT_PATH,
+                             fresh: bool = False, client: Optional[SefariaClient] = None,
+                             store: Optional[ArtifactStore] = None) -> bool:
+    """
+    Download every kovetz and merge them into one text file.
+
+    Args:
+        numbered: Prefix each paragraph with "פסקה N:"
+        workers: Kevatzim downloaded at the same time
+        output_path: Merged output file; checkpoints live next to it in ``<output_path>.parts/``.
+            It is only replaced once every kovetz downloaded; a run with failures writes what
+            it has to ``<output_path>.partial`` and leaves the existing file alone
+        fresh: Discard checkpoints from an earlier, interrupted run
+        client: Sefaria client (default: the shared cache and rate limit, 60 s timeout)
+        store: Where the merged file is kept (default: the shared artifact store)
+
+    Returns:
+        True if every kovetz was downloaded
+    """
+    print("מוריד את כל שמונה הקבצים של הרב קוק מ-Sefaria...")
+    client = client or default_client(concurrency=workers, timeout=60)
+    checkpoint_dir = output_path + '.parts'
+    if fresh:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    # מבנה הספר לפי האינדקס של Sefaria
+    try:
+        lengths = client.index(BOOK).get('schema', {}).get('lengths') or []
+    except FETCH_ERRORS as e:
+        print(f"שגיאה בקבלת מבנה הספר ({e}), מניח {DEFAULT_KEVATZIM} קבצים")
+        lengths = []
+    kevatzim = lengths[0] if lengths else DEFAULT_KEVATZIM
+    print(f"נמצאו {kevatzim} קבצים" + (f", {lengths[1]} פסקאות בסך הכל" if len(lengths) >= 2 else ""))
+
+    checkpoints = [KovetzCheckpoint(checkpoint_dir, number) for number in range(1, kevatzim + 1)]
+    written = failed = total_chars = 0
+    tmp_path = output_path + '.tmp'
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor, open(tmp_path, 'w', encoding='utf-8') as out:
+        futures = [executor.submit(fetch_kovetz, client, checkpoint) for checkpoint in checkpoints]
+        # מיזוג לפי הסדר: כל קובץ נכתב לפלט ברגע שהוא וכל הקודמים לו הסתיימו
+        for checkpoint, future in zip(checkpoints, futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"  שגיאה בהורדת קובץ {checkpoint.number}: {e}")
+                failed += 1
+                continue
+            paragraphs, chars = write_kovetz(out, checkpoint, numbered, first=not written)
+            if paragraphs:
+                written += 1
+                total_chars += chars
+                print(f"  קובץ {checkpoint.number} הורד בהצלחה ({paragraphs} פסקאות)")
+            else:
+                print(f"  קובץ {checkpoint.number} ריק")
+
+    if not written:
+        os.remove(tmp_path)
+        print("\nלא הורד תוכן!")
+        return False
+    partial_path = output_path + '.partial'
+    if failed:
+        # מיזוג חלקי לא מחליף קובץ מלא מהרצה קודמת
+        os.replace(tmp_path, partial_path)
+        saved_path = partial_path
+    else:
+        changed = (store or default_store()).commit(tmp_path, output_path)
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        saved_path = output_path
+
+    print(f"\n{SEPARATOR}")
+    if failed:
+        print("הקובץ המאוחד לא הוחלף; מה שהורד נשמר בקובץ חלקי")
+    else:
+        print("הקובץ המאוחד נשמר בהצלחה!" if changed else "הקובץ המאוחד לא השתנה")
+    print(f"שם הקובץ: {os.path.basename(saved_path)}")
+    print(f"גודל: {total_chars} תווים ({total_chars / 1024:.2f} KB)")
+    print(f"מספר קבצים שהורדו: {written}")
+    if failed:
+        print(f"{failed} קבצים נכשלו; הרצה חוזרת תמשיך מהפסקה האחרונה שנשמרה")
+    print(SEPARATOR)
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Download all of Shemonah Kevatzim from Sefaria into one text file')
+    parser.add_argument('--numbered', action='store_true', help='Prefix each paragraph with its number')
+    parser.add_argument('--workers', '-w', type=int, default=4, help='Kevatzim downloaded in parallel (default: 4)')
+    parser.add_argument('--output', '-o', default=OUTPUT_PATH, help='Merged output file (default: shmona_kevatzim_all.txt)')
+    parser.add_argument('--fresh', action='store_true', help='Ignore checkpoints left by an interrupted run')
+    parser.add_argument('--structure', action='store_true', help="Only print the book's index record")
+    args = parser.parse_args()
+
+    if args.structure:
+        print_structure()
+        return
+    if not download_shmona_kevatzim(args.numbered, args.workers, args.output, args.fresh):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
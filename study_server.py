@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Local server for the study pages, with a read-through cache of the Sefaria API.
+
+``daf-yomi.html``, ``mishnah.html``, ``torah.html`` and ``rav-kook.html`` fetch
+their texts from sefaria.org straight from the browser. ``daf-yomi.html`` alone
+sends up to nine requests per amud (the Gemara and eight commentaries), one
+after the other, and everyone in a study group sends the same ones.
+``StudyServer`` serves the pages and answers their ``/api/...`` requests itself:
+
+- Responses come from the shared response cache (``.cache/sefaria.sqlite``, the
+  one the downloaders fill), and recently served bodies are also kept in
+  memory, so a repeated lookup is answered locally in milliseconds. The
+  downloaders fetch ranges such as ``Berakhot.2a-2b`` and also cache each amud
+  of them under its own ref (``SefariaClient.store_sections``), which is the ref
+  a page asks for
+- Identical requests that arrive while one is already on its way to Sefaria
+  wait for its answer instead of sending their own
+- Once an amud is asked for, the same source's next amudim are fetched in the
+  background, so the b side and the next daf are usually ready by the time the
+  page asks for them; ``--warm`` fetches whole tractates before anyone asks
+- Everything that does go to Sefaria shares one ``SefariaClient``: its rate
+  limit, retries and circuit breakers
+
+A page served by this server sends its requests here; opened any other way it
+keeps talking to sefaria.org directly.
+
+    python study_server.py --port 8000 --warm Berakhot:2a-10b
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+from urllib.parse import quote, unquote, urlsplit
+
+import requests
+
+from daf_yomi_downloader import TRACTATES, parse_amud
+from http_cache import DEFAULT_CACHE_PATH, ResponseCache
+from sefaria_client import FETCH_ERRORS, SefariaClient, default_client
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# The only files served besides the API
+PAGES = ['index.html', 'daf-yomi.html', 'mishnah.html', 'torah.html', 'rav-kook.html']
+
+# Added to every page served, so it sends its API requests to this server
+PAGE_MARKER = b'<script>window.SEFARIA_PROXY = true;</script>'
+
+# Query strings the pages (and SefariaClient.texts) use for base texts and for commentaries
+BASE_TEXT_QUERY = 'lang=he&commentary=0&context=0'
+COMMENTARY_QUERY = 'lang=he&context=0'
+
+# Sources daf-yomi.html can ask for per amud ("main" is the Gemara itself)
+DAF_SOURCES = ['main', 'Steinsaltz', 'Rashi', 'Tosafot', 'Meiri', 'Pnei Yehoshua', 'Ritva', 'Rashba',
+               'Shita Mekubetzet']
+
+AMUD_REF = re.compile(r'^(?:(?P<source>.+) on )?(?P<tractate>[^.]+)\.(?P<amud>\d+[ab])$')
+
+
+def amud_ref(tractate: str, source: str, amud: str) -> str:
+    return f"{tractate}.{amud}" if source == 'main' else f"{source} on {tractate}.{amud}"
+
+
+def next_amudim(tractate_info: dict, amud: str, count: int) -> List[str]:
+    """Up to ``count`` amudim following ``amud``, stopping at the end of the tractate."""
+    last = parse_amud(tractate_info["last"])
+    daf, side = parse_amud(amud)
+    following = []
+    while len(following) < count:
+        daf, side = (daf, 'b') if side == 'a' else (daf + 1, 'a')
+        if (daf, side) > last:
+            break
+        following.append(f"{daf}{side}")
+    return following
+
+
+def parse_warm(spec: str) -> Tuple[dict, str, str]:
+    """``Berakhot`` or ``Berakhot:2a-10b`` -> (tractate info, first amud, last amud)."""
+    name, _, span = spec.partition(':')
+    info = next((t for t in TRACTATES if t["english"].lower() == name.strip().lower()), None)
+    if info is None:
+        raise ValueError(f"Unknown tractate: {name}")
+    first, _, last = span.partition('-')
+    return info, first.strip() or info["first"], last.strip() or first.strip() or info["last"]
+
+
+class StudyServer:
+    def __init__(self, host: str = '127.0.0.1', port: int = 8000, client: Optional[SefariaClient] = None,
+                 root: str = ROOT, read_ahead: int = 2, memory_bytes: int = 64 * 1024 * 1024,
+                 memory_ttl: float = 3600.0, workers: int = 4):
+        """
+        Args:
+            host, port: Address to listen on (port 0 picks a free port)
+            client: Client the API requests go through (default: the shared response cache, 2 requests/sec)
+            root: Directory the pages are served from
+            read_ahead: Amudim fetched in the background after each amud a page asks for (0 to disable)
+            memory_bytes: Response bodies kept in memory, most recently used first
+            memory_ttl: Seconds a body is served from memory before going back through the response cache
+            workers: Threads fetching read-ahead and warm-up requests
+        """
+        self.client = client or default_client()
+        self.metrics = self.client.metrics
+        self.root = root
+        self.read_ahead = read_ahead
+        self.memory_bytes = memory_bytes
+        self.memory_ttl = memory_ttl
+        self.memory = OrderedDict()  # key -> (stored at, body)
+        self._memory_total = 0
+        self._inflight = {}  # key -> Future of the request already on its way
+        self._lock = threading.Lock()
+        self.prefetcher = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.tractates = {t["english"]: t for t in TRACTATES}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'StudyServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.prefetcher.shutdown(wait=False)
+
+    def _remember(self, key: str, body: bytes):
+        with self._lock:
+            old = self.memory.pop(key, None)
+            if old:
+                self._memory_total -= len(old[1])
+            self.memory[key] = (time.monotonic(), body)
+            self._memory_total += len(body)
+            while self._memory_total > self.memory_bytes and self.memory:
+                self._memory_total -= len(self.memory.popitem(last=False)[1][1])
+
+    def _recall(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.memory_ttl:
+                del self.memory[key]
+                self._memory_total -= len(entry[1])
+                return None
+            self.memory.move_to_end(key)
+            return entry[1]
+
+    def api(self, path: str, query: str) -> Tuple[int, bytes]:
+        """
+        Answer an API request: from memory, by joining an identical request already
+        on its way, or through the client (which serves it from the response cache
+        when it can).
+
+        Returns:
+            (HTTP status, JSON body)
+        """
+        key = f"{unquote(path)}?{query}"
+        body = self._recall(key)
+        if body is not None:
+            self.metrics.inc('proxy_requests_total', result='memory')
+            return 200, body
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            self.metrics.inc('proxy_requests_total', result='coalesced')
+            return future.result()
+
+        self.metrics.inc('proxy_requests_total', result='fetched')
+        try:
+            result = self._fetch(key, path, query)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _fetch(self, key: str, path: str, query: str) -> Tuple[int, bytes]:
+        ref = unquote(path[len('/api/texts/'):]) if path.startswith('/api/texts/') else None
+        source = ref.split(' on ', 1)[0] if ref and ' on ' in ref else 'main'
+        try:
+            if ref and query in (BASE_TEXT_QUERY, COMMENTARY_QUERY):
+                # The entry the downloaders store for this ref, fetched alone or split out of a range
+                data = self.client.texts(ref, source, base_text=query == BASE_TEXT_QUERY)
+            else:
+                url = f"{self.client.base_url}{path}" + (f"?{query}" if query else '')
+                data = self.client.get_json(key, url, source)
+        except requests.exceptions.HTTPError as e:
+            return e.response.status_code, e.response.content
+        except FETCH_ERRORS as e:
+            return 502, json.dumps({"error": f"Sefaria request failed: {e}"}).encode('utf-8')
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        # Sefaria's errors ("not a valid reference", a commentary missing on this amud) are kept
+        # too, in memory only: they are answers about the ref, not failures of the request
+        self._remember(key, body)
+        return 200, body
+
+    def prefetch(self, ref: str, query: str):
+        """Fetch a texts ref in the background so it is cached when a page asks for it."""
+        self.prefetcher.submit(self._prefetch, '/api/texts/' + quote(ref), query)
+
+    def _prefetch(self, path: str, query: str):
+        try:
+            self.api(path, query)
+        except Exception as e:
+            print(f"  Prefetch of {unquote(path)} failed: {e}")
+
+    def after_request(self, path: str, query: str):
+        """Read ahead: queue the next amudim of the source a page just asked for."""
+        if not self.read_ahead or not path.startswith('/api/texts/'):
+            return
+        match = AMUD_REF.match(unquote(path[len('/api/texts/'):]))
+        info = match and self.tractates.get(match.group('tractate'))
+        if not info:
+            return
+        source = match.group('source') or 'main'
+        for amud in next_amudim(info, match.group('amud'), self.read_ahead):
+            self.prefetch(amud_ref(info["english"], source, amud), query)
+
+    def warm(self, tractate_info: dict, first: str, last: str, sources: List[str]):
+        """Queue every amud from ``first`` to ``last`` of a tractate, for each source."""
+        amudim = [first] + next_amudim(tractate_info, first, 10 ** 6)
+        amudim = [amud for amud in amudim if parse_amud(amud) <= parse_amud(last)]
+        for amud in amudim:
+            for source in sources:
+                self.prefetch(amud_ref(tractate_info["english"], source, amud),
+                              BASE_TEXT_QUERY if source == 'main' else COMMENTARY_QUERY)
+        print(f"Warming {tractate_info['english']} {first}-{last}: {len(amudim) * len(sources)} requests queued")
+
+    def page(self, name: str) -> Optional[bytes]:
+        """A study page, marked as served by this server (None if it isn't one of PAGES)."""
+        if name not in PAGES:
+            return None
+        with open(os.path.join(self.root, name), 'rb') as f:
+            html = f.read()
+        return html.replace(b'<head>', b'<head>\n  ' + PAGE_MARKER, 1)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; without TCP_NODELAY a kept-alive
+            # connection stalls ~40 ms on every response waiting for a delayed ACK
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if parts.path.startswith('/api/'):
+                    status, body = server.api(parts.path, parts.query)
+                    self.send(status, body, 'application/json; charset=utf-8')
+                    server.after_request(parts.path, parts.query)
+                elif parts.path == '/metrics':
+                    self.send(200, server.metrics.to_prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+                else:
+                    body = server.page(unquote(parts.path).lstrip('/') or 'index.html')
+                    if body is None:
+                        self.send(404, b'Not found', 'text/plain; charset=utf-8')
+                    else:
+                        self.send(200, body, 'text/html; charset=utf-8', {'Cache-Control': 'no-cache'})
+
+            def send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the study pages with a local, cached Sefaria API')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Address to listen on (default: 127.0.0.1; 0.0.0.0 to share with the study group)')
+    parser.add_argument('--port', '-p', type=int, default=8000, help='Port to listen on (default: 8000)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='Response cache file (default: .cache/sefaria.sqlite)')
+    parser.add_argument('--cache-ttl', type=float, default=7.0,
+                        help='Days a cached response is used without revalidation (default: 7)')
+    parser.add_argument('--rate', type=float, default=2.0, help='Maximum requests per second to Sefaria (default: 2.0)')
+    parser.add_argument('--read-ahead', type=int, default=2,
+                        help='Amudim fetched in the background after each one a page asks for (default: 2)')
+    parser.add_argument('--warm', action='append', default=[], metavar='TRACTATE[:FIRST-LAST]',
+                        help='Fetch a tractate (or a range of amudim, e.g. Berakhot:2a-10b) at startup; repeatable')
+    parser.add_argument('--warm-sources', default='main,Steinsaltz,Rashi,Tosafot',
+                        help=f"Comma-separated sources --warm fetches (default: main,Steinsaltz,Rashi,Tosafot; "
+                             f"available: {','.join(DAF_SOURCES)})")
+    args = parser.parse_args()
+
+    client = SefariaClient(rate=args.rate, cache=ResponseCache(args.cache, ttl=args.cache_ttl * 24 * 3600))
+    server = StudyServer(args.host, args.port, client, read_ahead=args.read_ahead)
+    sources = [s.strip() for s in args.warm_sources.split(',') if s.strip()]
+    for spec in args.warm:
+        try:
+            server.warm(*parse_warm(spec), sources)
+        except ValueError as e:
+            print(e)
+    print(f"Serving the study pages on {server.url}/ (e.g. {server.url}/daf-yomi.html)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        server.prefetcher.shutdown(wait=False)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Client for the MediaWiki API of Hebrew Wikisource.
+
+The Hashem Roei scripts used to send one ``action=query`` per page with a long
+sleep before each. ``WikisourceClient`` asks for up to 50 pages per request
+(``titles=A|B|C``), follows the API's ``continue`` protocol, and finds a book's
+pages up front: its subpages with ``list=allpages`` and the pages a title links
+to with ``generator=links``. Requests go through one pooled ``requests.Session``
+and transient failures are retried with backoff.
+
+The pace is the server's to set. Requests go out as fast as the (generous)
+rate limiter allows until Wikisource pushes back: API requests carry ``maxlag``
+so a lagged database answers with a ``maxlag`` error rather than being loaded
+further, and a ``maxlag``/``ratelimited`` error or a 429/503 pauses every
+request for the ``Retry-After`` the server sent (or the lag it reported) and
+halves the rate, which then climbs back as requests succeed.
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import unquote, urljoin, urlsplit, urlunsplit
+
+import requests
+
+from metrics import Metrics
+from rate_limiter import RateLimiter, THROTTLE_STATUSES, parse_retry_after
+from retry import RetryPolicy, is_retryable
+
+WIKI_URL = 'https://he.wikisource.org'
+DEFAULT_API_URL = WIKI_URL + '/w/api.php'
+
+# Point the Wikisource scripts at another wiki (or a local stand-in) without code changes
+WIKISOURCE_API_URL = os.environ.get('WIKISOURCE_API_URL', DEFAULT_API_URL)
+
+# Wikimedia asks automated clients to identify themselves instead of posing as a browser
+USER_AGENT = 'Daf Yomi Downloader (respectful automated access; Wikisource book downloader) python-requests'
+
+# Most titles one query may name (the limit for clients without the apihighlimits right)
+MAX_TITLES = 50
+
+# Seconds of database replication lag at which the API should refuse our requests
+# (the value Wikimedia recommends for bots)
+MAXLAG = 5
+
+# API error codes that mean "slow down" rather than "this request is wrong"
+THROTTLE_ERRORS = ('maxlag', 'ratelimited')
+
+
+class WikisourceError(Exception):
+    """An error the API reported in the body of a response."""
+
+    def __init__(self, code: str, info: str):
+        super().__init__(f"{code}: {info}")
+        self.code = code
+        self.info = info
+
+
+def normalize_title(title: str) -> str:
+    """Canonical form of a page title: spaces for underscores, no fragment, single spaces."""
+    title = title.split('#', 1)[0].replace('_', ' ')
+    return re.sub(r'\s+', ' ', title).strip()
+
+
+def normalize_page_url(url: str, base: str = WIKI_URL + '/') -> str:
+    """Canonical form of a page URL (relative ones resolved against ``base``): percent-decoded, underscores for spaces, no fragment."""
+    parts = urlsplit(urljoin(base, url))
+    return urlunsplit((parts.scheme, parts.netloc, unquote(parts.path).replace(' ', '_'), parts.query, ''))
+
+
+def batches(items: List[str], size: int = MAX_TITLES) -> Iterator[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class WikisourceClient:
+    def __init__(
+        self,
+        api_url: str = WIKISOURCE_API_URL,
+        rate: float = 10.0,
+        burst: int = 5,
+        retry_policy: Optional[RetryPolicy] = None,
+        metrics: Optional[Metrics] = None,
+        timeout: float = 60.0,
+        maxlag: Optional[int] = MAXLAG,
+        concurrency: int = 4,
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            api_url: ``api.php`` endpoint of the wiki
+            rate: Ceiling on requests per second; the client only drops below it when the server asks
+            burst: Number of requests that may be sent back-to-back before the rate applies
+            retry_policy: Backoff used when a request fails transiently
+            metrics: Where request metrics are recorded
+            timeout: Seconds to wait for the server on each request
+            maxlag: ``maxlag`` sent with every API request (None to not send it)
+            concurrency: Connections kept alive in the pool (one per worker thread)
+        """
+        self.api_url = api_url
+        self.rate_limiter = RateLimiter(rate=rate, burst=burst)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.metrics = metrics or Metrics()
+        self.timeout = timeout
+        self.maxlag = maxlag
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': USER_AGENT})
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, concurrency))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _throttled(self, reason: str, retry_after: Optional[float]):
+        self.metrics.inc('http_throttled_total', source='wikisource')
+        print(f"  Wikisource asked us to slow down ({reason}), backing off"
+              f"{f' {retry_after:.0f}s' if retry_after is not None else ''}...")
+        self.rate_limiter.on_throttle(retry_after)
+
+    def get(self, url: str, params: Optional[dict] = None, max_throttle_retries: int = 8) -> requests.Response:
+        """
+        GET a URL (an API call or a page), pausing while the server throttles us and
+        retrying transient failures with backoff. Returns a successful response.
+
+        Raises:
+            requests.exceptions.RequestException: The request failed for good
+        """
+        delays = self.retry_policy.delays()
+        throttles = 0
+        while True:
+            started = time.monotonic()
+            self.rate_limiter.acquire()
+            sent = time.monotonic()
+            self.metrics.inc('rate_limit_wait_seconds_total', sent - started, source='wikisource')
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                self.metrics.observe('http_request_duration_seconds', time.monotonic() - sent, source='wikisource')
+                self.metrics.inc('http_requests_total', source='wikisource', status=response.status_code)
+                with self._lock:
+                    self.request_count += 1
+                if response.status_code in THROTTLE_STATUSES and throttles < max_throttle_retries:
+                    throttles += 1
+                    self._throttled(f"HTTP {response.status_code}", parse_retry_after(response.headers.get('Retry-After')))
+                    continue
+                response.raise_for_status()
+                self.rate_limiter.on_success()
+                return response
+            except requests.exceptions.RequestException as e:
+                delay = next(delays, None) if is_retryable(e) else None
+                if delay is None:
+                    raise
+                print(f"  Retrying {url} in {delay:.1f}s ({e})")
+                self.metrics.inc('http_retries_total', source='wikisource')
+                self.metrics.inc('retry_backoff_seconds_total', delay, source='wikisource')
+                time.sleep(delay)
+
+    def api(self, params: dict, max_throttle_retries: int = 8) -> dict:
+        """
+        Send one API request and return the decoded body.
+
+        A ``maxlag`` or ``ratelimited`` error pauses the client and the request is sent again.
+
+        Raises:
+            WikisourceError: The API answered with an error
+            requests.exceptions.RequestException: The request failed for good
+        """
+        params = dict(params, format='json', formatversion='2')
+        if self.maxlag is not None:
+            params['maxlag'] = self.maxlag
+        for attempt in range(max_throttle_retries + 1):
+            response = self.get(self.api_url, params)
+            data = response.json()
+            error = data.get('error')
+            if not error:
+                return data
+            code = error.get('code', '')
+            if code not in THROTTLE_ERRORS or attempt == max_throttle_retries:
+                raise WikisourceError(code, error.get('info', ''))
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is None and error.get('lag') is not None:
+                retry_after = float(error['lag'])
+            self._throttled(error.get('info') or code, retry_after)
+
+    def query(self, **params) -> Iterator[dict]:
+        """Run ``action=query``, following ``continue`` until the result is complete; yields each ``query`` part."""
+        continuation = {}
+        while True:
+            data = self.api({'action': 'query', **params, **continuation})
+            yield data.get('query', {})
+            if 'continue' not in data:
+                return
+            continuation = data['continue']
+
+    def subpages(self, title: str, namespace: int = 0) -> List[str]:
+        """Titles of every page under ``title/`` (e.g. the chapters of a book)."""
+        titles = []
+        for part in self.query(list='allpages', apprefix=normalize_title(title) + '/', apnamespace=namespace,
+                               aplimit='max'):
+            titles += [page['title'] for page in part.get('allpages', [])]
+        return titles
+
+    def links(self, titles: List[str], namespace: int = 0) -> List[str]:
+        """Existing pages that any of ``titles`` link to."""
+        found = []
+        for batch in batches(titles):
+            for part in self.query(generator='links', titles='|'.join(batch), gplnamespace=namespace,
+                                   gpllimit='max'):
+                found += [page['title'] for page in part.get('pages', []) if not page.get('missing')]
+        return list(dict.fromkeys(found))
+
+    def page_contents(self, titles: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Wikitext of many pages, ``MAX_TITLES`` per request, following redirects.
+
+        Returns:
+            The content of each requested title, keyed as it was given (None for a missing page)
+        """
+        contents = {}
+        for batch in batches(list(dict.fromkeys(titles))):
+            resolved, by_title = {}, {}
+            for part in self.query(prop='revisions', rvprop='content', rvslots='main', redirects='1',
+                                   titles='|'.join(batch)):
+                for step in part.get('normalized', []) + part.get('redirects', []):
+                    resolved[step['from']] = step['to']
+                for page in part.get('pages', []):
+                    revisions = page.get('revisions') or []
+                    if revisions:
+                        by_title[page['title']] = revisions[0].get('slots', {}).get('main', {}).get('content', '')
+            for title in batch:
+                target, seen = title, set()
+                while target in resolved and target not in seen:
+                    seen.add(target)
+                    target = resolved[target]
+                contents[title] = by_title.get(target)
+        return contents
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Text and links of a Wikisource HTML page, from one parse.
+
+``download_hashem_roei.py`` used to build a BeautifulSoup tree of every page
+twice (once for its links, once more to extract the text) and then search it
+again with ``find_all`` to drop navigation boxes. ``extract_page`` reads a page
+once and returns both: the lines of text in the content area, without
+navboxes, tables of contents, edit links, scripts and styles, and the href of
+every link in it.
+
+Two interchangeable backends give the same result:
+
+- ``lxml``: lxml's C parser builds the tree, and one walk over the content
+  area collects the text and the links
+- ``stream``: the standard library's ``html.parser`` tokenizer, with no tree
+  at all; text and links are picked up as the tags go by
+
+``lxml`` is used when it is installed (``pip install lxml``).
+"""
+
+from html.parser import HTMLParser
+from typing import List, NamedTuple, Optional
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# Content area of a page: the first div with this id, or else the first with this class
+CONTENT_ID = 'mw-content-text'
+CONTENT_CLASS = 'mw-parser-output'
+
+# Elements dropped, with everything in them, when they carry one of these classes
+SKIPPED_TAGS = {'script', 'style', 'nav', 'table', 'div', 'span'}
+SKIPPED_CLASSES = {'navbox', 'toc', 'mw-editsection'}
+
+# Elements whose content is code, not text
+RAW_TEXT_TAGS = {'script', 'style'}
+
+# Shorter lines are navigation debris (single letters, separators), not text
+MIN_LINE_LENGTH = 3
+
+
+class Page(NamedTuple):
+    text: Optional[str]  # None if the page has no content area
+    links: List[str]     # href of every link in the content area (navboxes included), in order
+
+
+def _skipped(tag: str, classes: Optional[str]) -> bool:
+    return tag in SKIPPED_TAGS and bool(classes) and not SKIPPED_CLASSES.isdisjoint(classes.split())
+
+
+def _join_lines(strings: List[str]) -> str:
+    """The page's text nodes as lines, dropping blank and too-short ones."""
+    lines = []
+    for string in strings:
+        for line in string.split('\n'):
+            line = line.strip()
+            if len(line) >= MIN_LINE_LENGTH:
+                lines.append(line)
+    return '\n'.join(lines)
+
+
+def _extract_lxml(html_content: str) -> Page:
+    if lxml is None:
+        raise ImportError("the lxml backend needs lxml (pip install lxml)")
+    root = lxml.html.document_fromstring(html_content)
+    area = root.find(f'.//div[@id="{CONTENT_ID}"]')
+    if area is None:
+        area = next((div for div in root.iter('div') if CONTENT_CLASS in div.get('class', '').split()), None)
+    if area is None:
+        return Page(None, [])
+
+    strings, links = [], []
+
+    def walk(element):
+        tag = element.tag
+        if tag == 'a' and element.get('href'):
+            links.append(element.get('href'))
+        if _skipped(tag, element.get('class')):
+            links.extend(a.get('href') for a in element.iter('a') if a.get('href'))
+            return
+        if element.text and tag not in RAW_TEXT_TAGS:
+            strings.append(element.text)
+        for child in element:
+            if isinstance(child.tag, str):  # not a comment
+                walk(child)
+            if child.tail:
+                strings.append(child.tail)
+
+    walk(area)
+    return Page(_join_lines(strings), links)
+
+
+class _StreamExtractor(HTMLParser):
+    """Collects the text and links of both candidate content areas as the page is tokenized."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.areas = {}        # CONTENT_ID / CONTENT_CLASS -> (text nodes, hrefs)
+        self.open_areas = {}   # areas being read -> div depth of their opening tag
+        self.div_depth = 0
+        self.skipping = None   # [tag, nesting] of the element being dropped
+        self.raw_text = False  # inside <script> or <style>
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'div':
+            self.div_depth += 1
+            if CONTENT_ID not in self.areas and attrs.get('id') == CONTENT_ID:
+                self.areas[CONTENT_ID] = ([], [])
+                self.open_areas[CONTENT_ID] = self.div_depth
+            if CONTENT_CLASS not in self.areas and CONTENT_CLASS in (attrs.get('class') or '').split():
+                self.areas[CONTENT_CLASS] = ([], [])
+                self.open_areas[CONTENT_CLASS] = self.div_depth
+        if not self.open_areas:
+            return
+        if tag == 'a' and attrs.get('href'):
+            for area in self.open_areas:
+                self.areas[area][1].append(attrs['href'])
+        if self.skipping:
+            if tag == self.skipping[0]:
+                self.skipping[1] += 1
+        elif _skipped(tag, attrs.get('class')):
+            self.skipping = [tag, 1]
+        elif tag in RAW_TEXT_TAGS:
+            self.raw_text = True
+
+    def handle_endtag(self, tag):
+        if self.skipping and tag == self.skipping[0]:
+            self.skipping[1] -= 1
+            if not self.skipping[1]:
+                self.skipping = None
+        if tag in RAW_TEXT_TAGS:
+            self.raw_text = False
+        if tag == 'div':
+            for area, depth in list(self.open_areas.items()):
+                if depth == self.div_depth:
+                    del self.open_areas[area]
+            self.div_depth -= 1
+
+    def handle_data(self, data):
+        if self.open_areas and not self.skipping and not self.raw_text:
+            for area in self.open_areas:
+                self.areas[area][0].append(data)
+
+
+def _extract_stream(html_content: str) -> Page:
+    parser = _StreamExtractor()
+    parser.feed(html_content)
+    parser.close()
+    area = parser.areas.get(CONTENT_ID) or parser.areas.get(CONTENT_CLASS)
+    if area is None:
+        return Page(None, [])
+    strings, links = area
+    return Page(_join_lines(strings), links)
+
+
+BACKENDS = {'lxml': _extract_lxml, 'stream': _extract_stream}
+DEFAULT_BACKEND = 'lxml' if lxml is not None else 'stream'
+
+
+def extract_page(html_content: str, backend: Optional[str] = None) -> Page:
+    """
+    Text and links of a Wikisource page, parsing its HTML once.
+
+    Args:
+        html_content: The page's HTML
+        backend: ``lxml`` or ``stream`` (default: ``lxml`` when it is installed)
+
+    Raises:
+        ImportError: The lxml backend was asked for but lxml isn't installed
+    """
+    if not html_content:
+        return Page(None, [])
+    return BACKENDS[backend or DEFAULT_BACKEND](html_content)
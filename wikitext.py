@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Wikitext to plain text.
+
+``clean_wikitext`` used to be six ``re.sub`` passes over the whole page, each
+compiled on every call. Because tags were stripped before ``<ref>`` blocks, the
+body of every reference leaked into the output, and a nested template
+(``{{a|{{b}}}}``) left its tail behind. Now:
+
+- ``{{...}}`` templates are dropped, at any nesting depth; a ``{{`` that is never
+  closed is dropped on its own and the text after it kept
+- ``[[target|label]]`` becomes its label and ``[[target]]`` its target
+- ``<ref>...</ref>`` blocks, ``<ref/>`` tags and ``<!-- comments -->`` are dropped
+- other HTML tags are dropped and their content kept
+- runs of blank lines are collapsed to one, including those left by removed markup
+
+Well-formed markup is removed by a few precompiled ``re.sub`` passes, which run
+in C: references, comments and tags first, then templates innermost first (one
+pass per level of nesting), then links. Removed markup is replaced by a NUL
+placeholder until the end, so that ``[<ref/>[`` doesn't turn into a link. If a
+brace, ``[[``, ``]]`` or ``<`` is left after that (markup left unclosed, a link
+with several pipes or a ``<`` in its label), the whole page goes through
+``_scan`` instead: a single-pass tokenizer with a bracket stack, which is
+slower but handles the malformed kind too. The two agree on well-formed markup;
+they can differ only on stray brackets inside a tag or reference.
+
+This is a correctness fix, not a speed-up: even the fast passes run two to three
+times slower than the old chain, which did less work. ``python benchmark.py
+--wikitext-mb 8`` measures all three.
+"""
+
+import operator
+import re
+
+# One match per piece of markup. Every alternative starts with a literal character,
+# which lets the regex engine skip over plain text without trying each alternative.
+TOKEN = re.compile(r"""
+    <(?:
+        (?P<ref>ref\b[^>]*?/>|ref\b[^>]*>.*?</ref\s*>)
+      | (?P<comment>!--.*?-->)
+      | (?P<tag>/?[A-Za-z][^>]*>)
+    )
+  | \[\[(?:
+        (?:[^\[\]{}|<\n]*\|)?(?P<link>[^\[\]{}|<\n]*)\]\]
+      | (?P<open_link>)
+    )
+  | \{\{(?:
+        (?P<template>[^{}]*\}\})
+      | (?P<open_template>)
+    )
+  | \}\}(?P<close_template>)
+  | \]\](?P<close_link>)
+  | \|(?P<pipe>)
+""", re.VERBOSE | re.DOTALL)
+
+# The fast path: the same markup as TOKEN's ref/comment, tag, flat template and flat link
+ANGLE_MARKUP = re.compile(r'<(?:!--.*?-->|ref\b(?:[^>]*?/>|[^>]*>.*?</ref\s*>)|/?[A-Za-z][^>]*>)', re.DOTALL)
+FLAT_TEMPLATE = re.compile(r'\{\{[^{}]*\}\}')
+FLAT_LINK = re.compile(r'\[\[(?:[^\[\]{}|<\n]*\|)?([^\[\]{}|<\n]*)\]\]')
+# A C-level replacement: a template like r'\1' is expanded in Python for every match
+LABEL = operator.itemgetter(1)
+# Left over after the fast passes, or in the page itself: markup only _scan gets right.
+# Checked with str.__contains__, which is many times faster than a regex search.
+LEFTOVER = ('{', '}', '<', '[[', ']]')
+AMBIGUOUS = ('\0', '[[[')
+
+# Not \n{3,}: a counted repeat gets no literal-prefix search and is several times slower
+BLANK_LINES = re.compile(r'\n\n\n+')
+
+
+def clean_wikitext(text: str) -> str:
+    """
+    Plain text of a page's wikitext.
+
+    >>> clean_wikitext("{{a|{{b}}}}[[target|label]] and [[page]]<ref>note</ref>")
+    'label and page'
+    >>> clean_wikitext("[[a|[[b|c]]]] <b>bold</b> [[x|y|z]]")
+    'c bold y|z'
+    >>> clean_wikitext("unclosed {{ template text")
+    'unclosed  template text'
+    >>> clean_wikitext("{{a}} kept {{ {{b}} tail")
+    'kept   tail'
+    """
+    if not text:
+        return ""
+
+    # A placeholder rather than '' so that '[<ref/>[' doesn't become a '[['
+    cleaned = ANGLE_MARKUP.sub('\0', text)
+    # Innermost first, one pass per level of nesting; the last pass is skipped when nothing is left
+    removed = True
+    while removed and '{{' in cleaned:
+        cleaned, removed = FLAT_TEMPLATE.subn('\0', cleaned)
+    replaced = True
+    while replaced and '[[' in cleaned:
+        cleaned, replaced = FLAT_LINK.subn(LABEL, cleaned)
+    # Anything left over means markup the passes can't take apart: scan the page itself
+    if any(s in cleaned for s in LEFTOVER) or any(s in text for s in AMBIGUOUS):
+        cleaned = _scan(text)
+    text = cleaned.replace('\0', '')
+    # Removed markup leaves runs of blank lines behind; collapse them along with the page's own
+    return BLANK_LINES.sub('\n\n', text).strip()
+
+
+def _scan(text: str) -> str:
+    """Markup removed by walking TOKEN matches once (twice if a ``{{`` is never closed)."""
+    out = []
+    links = []       # [label parts, seen a pipe] for every open [[...]]
+    parts = out      # where text goes: the label of the innermost open link, or the output
+    unclosed = ()    # starts of the {{ that the first scan found never closed
+    pos = 0
+    while True:
+        depth = 0    # open {{...}}
+        opened = []  # start of each open {{, innermost last
+        for match in TOKEN.finditer(text, pos):
+            start = match.start()
+            if depth == 0 and start > pos:
+                parts.append(text[pos:start])
+            pos = match.end()
+
+            kind = match.lastgroup
+            if kind == 'open_template':
+                if start not in unclosed:
+                    opened.append(start)
+                    depth += 1
+            elif kind == 'close_template':
+                if depth:
+                    opened.pop()
+                    depth -= 1
+                else:
+                    parts.append('}}')
+            elif depth:
+                continue
+            elif kind == 'link':
+                parts.append(match.group('link'))
+            elif kind == 'open_link':
+                links.append([[], False])
+                parts = links[-1][0]
+            elif kind == 'close_link':
+                if links:
+                    label = ''.join(links.pop()[0])
+                    parts = links[-1][0] if links else out
+                    parts.append(label)
+                else:
+                    parts.append(']]')
+            elif kind == 'pipe':
+                if links and not links[-1][1]:
+                    parts.clear()  # what came before the first pipe was the target
+                    links[-1][1] = True
+                else:
+                    parts.append('|')
+            # ref, comment, tag and flat template tokens are dropped
+
+        if not depth:
+            break
+        # An unclosed {{ would swallow the rest of the page. Nothing was emitted after the first
+        # one, so scan again from there, dropping only the unclosed openers; the pairs in between
+        # match up the same way, so this second scan always ends outside any template.
+        unclosed = set(opened)
+        pos = opened[0]
+
+    parts.append(text[pos:])
+    while links:  # an unclosed [[ keeps whatever it held
+        label = ''.join(links.pop()[0])
+        (links[-1][0] if links else out).append(label)
+    return ''.join(out)